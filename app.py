@@ -59,23 +59,36 @@ from streamlit_auth import (
     get_current_user,
     get_user_data
 )
+from streamlit_auth.instrumentation import begin_rerun
 
 # Your existing imports
 from core.state import init_study_state
-from ui.components import leaderboard, mode_selector
-from ui.study_tab import render_study_tab
+from ui.components import mode_selector
+from ui.study_tab import render_study_tab, reconcile_score_updates
 from ui.stats_tab import render_stats_tab
+from ui.leaderboard_tab import render_leaderboard_tab
 from ui.add_card_tab import render_add_card_tab
 from ui.manage_tab import render_manage_tab
-from data.deck_store import get_deck_names, get_deck
-from data.user_store import get_leaderboard
+from ui.admin_tab import render_admin_tab
+from data.deck_store import get_deck_names, migrate_embedded_cards
+from data.session_store import migrate_legacy_sessions
+from data.card_source import get_shared_deck
 
 
+# Attribute this rerun's database calls (only when [mongo] instrument = true)
+begin_rerun()
+
 # ----------------------------
 # Initialize Authentication
 # ----------------------------
 init_auth()
 
+# Move any cards still embedded in deck documents into the cards collection,
+# and any per-answer study sessions into buckets
+# (only does work the first time a process runs them)
+migrate_embedded_cards()
+migrate_legacy_sessions()
+
 # Handle authentication in sidebar
 logged_in_user = render_sidebar_auth()
 
@@ -113,21 +126,18 @@ deck_name = st.sidebar.selectbox(
 # ----------------------------
 st.title("🧬 Flashcard Study App")
 
+# Swap the optimistic score for the server's once background writes finish
+reconcile_score_updates(logged_in_user)
+
 # Get user data from auth module
 user_data = get_user_data()
 if not user_data:
     st.error("User not found")
     st.stop()
 
-# Track deck changes
-if "current_deck" not in st.session_state or st.session_state.current_deck != deck_name:
-    st.session_state.current_deck = deck_name
-    if "cards" in st.session_state:
-        del st.session_state.cards
-
-# Store cards in session state so callbacks can access them
-st.session_state.cards = get_deck(deck_name)
-cards = st.session_state.cards
+# One read-only copy of the deck per process, shared by all sessions; card
+# content is loaded into it a window at a time as sessions need it
+deck = get_shared_deck(deck_name)
 
 
 # app.py - Update the Tabs section
@@ -146,7 +156,7 @@ tab_objects = st.tabs(tabs)
 
 # Tab 1: Study (always available)
 with tab_objects[0]:
-    render_study_tab(cards, deck_name, logged_in_user, study_mode, init_study_state)
+    render_study_tab(deck, deck_name, logged_in_user, study_mode, init_study_state)
 
 # Tab 2: Stats (always available)
 with tab_objects[1]:
@@ -154,8 +164,7 @@ with tab_objects[1]:
 
 # Tab 3: Leaderboard (always available)
 with tab_objects[2]:
-    top_users = get_leaderboard(limit=10)
-    leaderboard(top_users)
+    render_leaderboard_tab(user_data, deck_names)
 
 # Admin-only tabs
 if user_data.get("is_admin", False):
@@ -169,4 +178,7 @@ if user_data.get("is_admin", False):
     
     # Tab 6: Admin Panel (admin only)
     with tab_objects[5]:
-        render_admin_panel()
\ No newline at end of file
+        render_admin_panel()
+        st.divider()
+        # Suspicious activity and rollup/detector maintenance
+        render_admin_tab()
\ No newline at end of file
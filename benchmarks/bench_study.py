@@ -0,0 +1,404 @@
+# benchmarks/bench_study.py
+"""
+Benchmarks for the study hot paths (Flip/Next/Answer) against an in-memory
+Mongo stand-in.
+
+Runs the real data.deck_store, data.user_store, core.answer_checking and
+core.quiz_generator functions on synthetic decks and user bases, and reports
+per-operation latency percentiles, Mongo round trips and allocations.
+
+Usage (needs `pip install -r requirements-dev.txt`):
+    python -m benchmarks.bench_study --out bench/baseline.json
+    python -m benchmarks.bench_study --compare bench/baseline.json
+"""
+import argparse
+import json
+import platform
+import random
+import string
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import mongomock
+
+
+# Collection methods that cost one round trip to a real server
+ROUND_TRIP_METHODS = {
+    "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "bulk_write", "aggregate", "distinct",
+    "count_documents", "estimated_document_count", "create_index", "create_indexes",
+}
+
+DEFAULT_CARDS = "10,100,1000,10000"
+DEFAULT_USERS = "10,1000,100000"
+
+_WORDS = (
+    "dna rna polymerase helicase ligase primase strand leading lagging okazaki fragment "
+    "chromosome centromere meiosis mitosis allele gene protein ribosome codon anticodon "
+    "transcription translation replication nucleotide base pair phosphate sugar enzyme"
+).split()
+
+
+class RoundTrips:
+    """Counts calls that would reach the server"""
+
+    def __init__(self):
+        self.count = 0
+
+
+class WriterFailed(Exception):
+    """The study log writer failed to write (or roll up) a batch"""
+
+
+class CountingCursor:
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+        self._started = False
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in ("sort", "skip", "limit", "batch_size"):
+            def chain(*args, **kwargs):
+                attr(*args, **kwargs)
+                return self
+            return chain
+        return attr
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # One round trip for the first batch; real servers batch the rest
+        if not self._started:
+            self._started = True
+            self._counter.count += 1
+        return next(self._cursor)
+
+
+class CountingCollection:
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    @property
+    def name(self):
+        return self._collection.name
+
+    def find(self, *args, **kwargs):
+        return CountingCursor(self._collection.find(*args, **kwargs), self._counter)
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in ROUND_TRIP_METHODS:
+            def counted(*args, **kwargs):
+                self._counter.count += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+class CountingDatabase:
+    def __init__(self, db, counter):
+        self._db = db
+        self._counter = counter
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self._counter)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(low, high)))
+
+
+def install_standin(seed=0):
+    """Point data.db at a fresh in-memory database wrapped with round-trip counting"""
+    import data.db
+    import data.deck_store
+    import data.leaderboard
+    import data.log_writer
+
+    counter = RoundTrips()
+    db = CountingDatabase(mongomock.MongoClient(tz_aware=False)["bench"], counter)
+    data.db._db = db
+    data.deck_store._deck_cache.clear()
+    data.deck_store._distractor_indexes.clear()
+    data.deck_store._cards_migrated = True
+    data.leaderboard._board = None
+    # Measure the enqueue cost only; the writer is flushed explicitly
+    rollups = db[data.log_writer.ROLLUP_COLLECTION]
+    hourly_rollups = db[data.log_writer.HOURLY_ROLLUP_COLLECTION]
+    detector = db[data.log_writer.DETECTOR_COLLECTION]
+    analytics = db[data.log_writer.ANALYTICS_COLLECTION]
+
+    def after_write(batch):
+        try:
+            data.log_writer.apply_rollups(rollups, batch)
+            data.log_writer.apply_rollups(hourly_rollups, batch, unit="hour")
+            data.log_writer.apply_detector(detector, batch)
+            data.log_writer.apply_analytics(analytics, batch)
+        except Exception as e:
+            after_write.errors.append(e)
+            raise
+
+    after_write.errors = []
+
+    data.log_writer._writer = data.log_writer.BufferedLogWriter(
+        db[data.log_writer.SESSION_BUCKETS], write=data.log_writer.write_sessions, after_write=after_write
+    )
+    return db, counter, random.Random(seed)
+
+
+def seed_deck(db, rng, name, size):
+    db.decks.insert_one({"_id": name, "version": 0, "next_position": size})
+    db.cards.insert_many([
+        {
+            "deck": name,
+            "position": position,
+            "question": f"Q{position}: {_sentence(rng, 4, 10)}?",
+            "answer": _sentence(rng, 3, 14)
+        }
+        for position in range(size)
+    ])
+
+
+def seed_users(db, rng, count):
+    db.users.insert_many([
+        {
+            "_id": f"user{n}",
+            "total_score": rng.randint(0, 5000),
+            "cards_studied": 0,
+            "correct_answers": 0,
+            "incorrect_answers": 0,
+            "current_streak": 0,
+            "best_streak": 0,
+            "verification_passed": 0,
+            "verification_failed": 0,
+            "flagged": rng.random() < 0.02
+        }
+        for n in range(count)
+    ])
+
+
+def _mutate(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(0, 6)):
+        position = rng.randrange(len(chars) + 1)
+        chars.insert(position, rng.choice(string.ascii_lowercase))
+    return "".join(chars)
+
+
+def measure(name, func, counter, iterations, time_budget):
+    """Time func() repeatedly, then count its round trips and allocations"""
+    try:
+        func()  # warm-up (fills caches the way a previous rerun would)
+    except NotImplementedError as e:
+        return {"name": name, "unsupported": str(e)}
+
+    latencies = []
+    trips_before = counter.count
+    deadline = time.perf_counter() + time_budget
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        latencies.append(time.perf_counter_ns() - start)
+        if time.perf_counter() > deadline and len(latencies) >= 5:
+            break
+    round_trips = (counter.count - trips_before) / len(latencies)
+
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] / 1000
+
+    return {
+        "name": name,
+        "iterations": len(latencies),
+        "p50_us": percentile(50),
+        "p95_us": percentile(95),
+        "p99_us": percentile(99),
+        "max_us": latencies[-1] / 1000,
+        "round_trips": round_trips,
+        "alloc_peak_bytes": peak,
+        "alloc_retained_bytes": current,
+    }
+
+
+def run(card_sizes, user_sizes, iterations, time_budget):
+    from core.answer_checking import check_answer
+    from core.quiz_generator import create_multiple_choice_question
+    from data import deck_store, user_store
+
+    results = []
+
+    for cards in card_sizes:
+        db, counter, rng = install_standin(seed=cards)
+        deck = f"deck-{cards}"
+        seed_deck(db, rng, deck, cards)
+        seed_users(db, rng, 10)
+        all_cards = deck_store.get_deck(deck)
+        samples = [rng.choice(all_cards) for _ in range(256)]
+        typed = [(_mutate(rng, card["answer"]), card["answer"]) for card in samples]
+
+        def cold_get_deck():
+            deck_store._invalidate_deck_cache(deck)
+            deck_store.get_deck(deck)
+
+        def next_question(state={"i": 0}):
+            state["i"] += 1
+            card = samples[state["i"] % len(samples)]
+            create_multiple_choice_question(card, all_cards, deck_store.get_distractor_index(deck))
+
+        def typed_answer(matcher, state={"i": 0}):
+            state["i"] += 1
+            user_answer, correct = typed[state["i"] % len(typed)]
+            check_answer(user_answer, correct, matcher=matcher)
+
+        results += [
+            measure(f"get_deck[warm,cards={cards}]", lambda: deck_store.get_deck(deck), counter, iterations, time_budget),
+            measure(f"get_deck[cold,cards={cards}]", cold_get_deck, counter, iterations, time_budget),
+            measure(f"multiple_choice[cards={cards}]", next_question, counter, iterations, time_budget),
+            measure(f"check_answer[fast,cards={cards}]", lambda: typed_answer("fast"), counter, iterations, time_budget),
+            measure(f"check_answer[difflib,cards={cards}]", lambda: typed_answer("difflib"), counter, iterations, time_budget),
+        ]
+
+    for users in user_sizes:
+        db, counter, rng = install_standin(seed=users)
+        seed_deck(db, rng, "deck", 100)
+        seed_users(db, rng, users)
+        usernames = [f"user{n}" for n in range(users)]
+        card = deck_store.get_deck("deck")[0]
+
+        def answer(state={"i": 0}):
+            state["i"] += 1
+            username = usernames[state["i"] % len(usernames)]
+            user_store.update_user_score(username, 10, correct=state["i"] % 3 != 0)
+            user_store.log_study_session(username, "deck", card["_id"], 2.5, True, "quiz", card["answer"])
+
+        def study_cycle(state={"i": 0}):
+            # What one Answer click + rerun costs: deck, leaderboard, grading, score, log
+            state["i"] += 1
+            username = usernames[state["i"] % len(usernames)]
+            cards = deck_store.get_deck("deck")
+            user_store.get_leaderboard(limit=10)
+            correct, _ = check_answer(_mutate(rng, cards[0]["answer"]), cards[0]["answer"])
+            user_store.update_user_score(username, 10, correct=correct)
+            user_store.log_study_session(username, "deck", cards[0]["_id"], 2.5, correct, "quiz")
+
+        results += [
+            measure(f"answer[users={users}]", answer, counter, iterations, time_budget),
+            measure(f"get_leaderboard[users={users}]", lambda: user_store.get_leaderboard(limit=10), counter, iterations, time_budget),
+            measure(f"get_suspicious_users[users={users}]", user_store.get_suspicious_users, counter, iterations, time_budget),
+            measure(f"study_cycle[users={users}]", study_cycle, counter, iterations, time_budget),
+        ]
+
+        import data.log_writer
+        flush_writer(data.log_writer._writer)
+
+    return results
+
+
+def flush_writer(writer):
+    """
+    Write the queued study logs; raise WriterFailed if any batch (or its
+    rollups) failed, since the timings would then leave out that work
+    """
+    writer.flush()
+    errors = writer.after_write.errors
+    if writer.failed or errors:
+        raise WriterFailed(
+            f"{writer.failed} log document(s) failed to write, {len(errors)} rollup error(s)"
+            + (f": {errors[0]}" if errors else "")
+        )
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print operations that got slower or chattier than the baseline"""
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = 0
+    for result in results:
+        old = previous.get(result["name"])
+        if not old or "unsupported" in result or "unsupported" in old:
+            continue
+        problems = []
+        if result["p50_us"] > old["p50_us"] * tolerance:
+            problems.append(f"p50 {old['p50_us']:.1f}us -> {result['p50_us']:.1f}us")
+        if result["round_trips"] > old["round_trips"]:
+            problems.append(f"round trips {old['round_trips']:.2f} -> {result['round_trips']:.2f}")
+        if problems:
+            regressions += 1
+            print(f"REGRESSION {result['name']}: {'; '.join(problems)}")
+    print(f"{regressions} regression(s) against baseline {baseline['meta'].get('revision')}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", default=DEFAULT_CARDS, help="comma-separated deck sizes")
+    parser.add_argument("--users", default=DEFAULT_USERS, help="comma-separated user counts")
+    parser.add_argument("--iterations", type=int, default=500, help="max iterations per operation")
+    parser.add_argument("--time-budget", type=float, default=2.0, help="seconds per operation")
+    parser.add_argument("--out", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed p50 slowdown ratio")
+    args = parser.parse_args()
+
+    try:
+        results = run(
+            [int(n) for n in args.cards.split(",")],
+            [int(n) for n in args.users.split(",")],
+            args.iterations,
+            args.time_budget,
+        )
+    except WriterFailed as e:
+        raise SystemExit(f"Benchmark invalid: {e} (see requirements-dev.txt for a working stand-in)")
+
+    print(f"{'operation':<42}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'trips':>7}{'peak KB':>9}")
+    for r in results:
+        if "unsupported" in r:
+            print(f"{r['name']:<42}  unsupported by the stand-in")
+            continue
+        print(
+            f"{r['name']:<42}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}{r['p99_us']:>10.1f}"
+            f"{r['round_trips']:>7.2f}{r['alloc_peak_bytes'] / 1024:>9.1f}"
+        )
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "created_at": datetime.utcnow().isoformat(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.tolerance):
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,188 @@
 # core/answer_checking.py
 
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+from functools import lru_cache
+
+
+_PUNCTUATION = str.maketrans("", "", ".,")
+
+# Correct answers are prepared (normalized, tokenized, bit masks built) once
+# and cached; this comfortably holds several large decks.
+PREPARED_CACHE_SIZE = 16384
+
+# Batches at least this large are graded in worker processes
+PARALLEL_MIN_BATCH = 50000
 
 
 def normalize_answer(text):
     """Normalize answer for comparison"""
-    return text.lower().strip().replace(".", "").replace(",", "")
+    return text.lower().strip().translate(_PUNCTUATION)
+
+
+def _token_key(normalized):
+    """Unique tokens in sorted order, so word order doesn't matter"""
+    return " ".join(sorted(set(normalized.split())))
 
 
-def check_answer(user_answer, correct_answer, threshold=0.8):
+def _char_masks(text):
+    """Bit mask of the positions of each character, for bit-parallel LCS"""
+    masks = {}
+    for position, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    return masks
+
+
+@lru_cache(maxsize=PREPARED_CACHE_SIZE)
+def _prepare(correct_answer):
+    normalized = normalize_answer(correct_answer)
+    token_key = _token_key(normalized)
+    return normalized, _char_masks(normalized), token_key, _char_masks(token_key)
+
+
+def _bounded_lcs_ratio(text, other, other_masks, threshold):
+    """
+    Similarity 2 * LCS / (len(text) + len(other)), the same measure difflib's
+    ratio() approximates, computed with a bit-parallel LCS (one big-int step
+    per character of text). Gives up as soon as the threshold is out of
+    reach and then returns an upper bound that is below the threshold.
+    """
+    total = len(text) + len(other)
+    if total == 0:
+        return 1.0
+
+    # Even a perfect overlap of the shorter string can't reach the threshold
+    if 2 * min(len(text), len(other)) < threshold * total:
+        return 2 * min(len(text), len(other)) / total
+
+    needed = threshold * total / 2
+    full = (1 << len(other)) - 1
+    row = full
+    for done, char in enumerate(text, 1):
+        mask = other_masks.get(char, 0)
+        matched = row & mask
+        row = ((row + matched) | (row - matched)) & full
+        if done % 16 == 0:
+            upper = len(other) - row.bit_count() + len(text) - done
+            if upper < needed:
+                return 2 * upper / total
+
+    return 2 * (len(other) - row.bit_count()) / total
+
+
+def _difflib_similarity(user_norm, prepared, threshold):
+    """Reference matcher: difflib's SequenceMatcher ratio"""
+    return SequenceMatcher(None, user_norm, prepared[0]).ratio()
+
+
+def _edit_similarity(user_norm, prepared, threshold):
+    """Character-level similarity with early exit"""
+    return _bounded_lcs_ratio(user_norm, prepared[0], prepared[1], threshold)
+
+
+def _token_set_similarity(user_norm, prepared, threshold):
+    """Similarity of the sorted unique tokens, for answers given in another order"""
+    return _bounded_lcs_ratio(_token_key(user_norm), prepared[2], prepared[3], threshold)
+
+
+def _fast_similarity(user_norm, prepared, threshold):
+    """Character similarity, falling back to token order-insensitive similarity"""
+    similarity = _edit_similarity(user_norm, prepared, threshold)
+    if similarity >= threshold:
+        return similarity
+    return max(similarity, _token_set_similarity(user_norm, prepared, threshold))
+
+
+MATCHERS = {
+    "fast": _fast_similarity,
+    "edit": _edit_similarity,
+    "token_set": _token_set_similarity,
+    "difflib": _difflib_similarity,
+}
+DEFAULT_MATCHER = "fast"
+
+
+def check_answer(user_answer, correct_answer, threshold=0.8, matcher=DEFAULT_MATCHER):
     """
     Check if user answer is correct using fuzzy matching
+    matcher: name of an entry in MATCHERS ("difflib" is the original reference)
     Returns: (is_correct, similarity_score)
     """
     user_norm = normalize_answer(user_answer)
-    correct_norm = normalize_answer(correct_answer)
-    
+    prepared = _prepare(correct_answer)
+
     # Exact match
-    if user_norm == correct_norm:
+    if user_norm == prepared[0]:
         return True, 1.0
+
+    similarity = MATCHERS[matcher](user_norm, prepared, threshold)
+
+    return similarity >= threshold, similarity
+
+
+def _grade_chunk(pairs, threshold, matcher):
+    return [check_answer(user, correct, threshold, matcher)[1] for user, correct in pairs]
+
+
+def check_answers_batch(pairs, threshold=0.8, matcher=DEFAULT_MATCHER, workers=None):
+    """
+    Grade many (user_answer, correct_answer) pairs at once.
+    Identical pairs are graded once; large batches are split across processes.
+    Returns: array of similarity scores, one per pair (correct when >= threshold)
+    """
+    pairs = list(pairs)
+    unique = list(dict.fromkeys(pairs))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    if len(unique) < PARALLEL_MIN_BATCH or workers <= 1:
+        scores = _grade_chunk(unique, threshold, matcher)
+    else:
+        # Fresh interpreters rather than forks of the (threaded) Streamlit server
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Group by correct answer so each worker prepares a key answer once
+            unique.sort(key=lambda pair: pair[1])
+            chunk_size = max(1000, len(unique) // (workers * 4))
+            chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+            scores = [
+                score
+                for chunk_scores in pool.map(_grade_chunk, chunks, [threshold] * len(chunks), [matcher] * len(chunks))
+                for score in chunk_scores
+            ]
+    
+    score_by_pair = dict(zip(unique, scores))
+    return array("d", (score_by_pair[pair] for pair in pairs))
+
+
+def regrade_deltas(records, similarities, threshold=0.8):
+    """
+    Compare new grades with the ones originally given.
+    Args:
+        records: dicts with "username" and "correct" (the original grade)
+        similarities: new scores for the records, e.g. from check_answers_batch
+    Returns: (changes, deltas)
+        changes: list of (record position, new correct flag) for regraded records
+        deltas: username -> $inc document for the user's score and counters
+    """
+    from core.scoring import BASE_POINTS, WRONG_PENALTY
     
-    # Fuzzy match using sequence matcher
-    similarity = SequenceMatcher(None, user_norm, correct_norm).ratio()
+    changes = []
+    deltas = {}
+    for position, (record, similarity) in enumerate(zip(records, similarities)):
+        now_correct = similarity >= threshold
+        if now_correct == bool(record.get("correct")):
+            continue
+        changes.append((position, now_correct))
+        
+        sign = 1 if now_correct else -1
+        delta = deltas.setdefault(record["username"], {
+            "total_score": 0, "correct_answers": 0, "incorrect_answers": 0
+        })
+        delta["total_score"] += sign * (BASE_POINTS - WRONG_PENALTY)
+        delta["correct_answers"] += sign
+        delta["incorrect_answers"] -= sign
     
-    return similarity >= threshold, similarity
\ No newline at end of file
+    return changes, deltas
@@ -1,28 +1,127 @@
 # core/quiz_generator.py
 
+import heapq
+import math
 import random
-from difflib import SequenceMatcher
+import re
+from collections import Counter, defaultdict
 
+from core.answer_checking import normalize_answer
 
-def generate_fake_answers(correct_answer, all_answers, count=3):
-    """Generate plausible fake answers"""
-    fake_answers = []
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it its of on or that the this to with".split()
+)
+
+
+def _answer_features(normalized):
+    """Words plus character trigrams of longer words (so 'polymerase' ~ 'primase')"""
+    words = [w for w in _WORD_RE.findall(normalized) if w not in _STOPWORDS]
+    features = set(words)
+    for word in words:
+        if len(word) > 3:
+            features.update(f"#{word[i:i + 3]}" for i in range(len(word) - 2))
+    return features
+
+
+class DistractorIndex:
+    """
+    Similarity index over a deck's answers, built once per deck.
+    Answers are turned into tf-idf weighted word/trigram vectors stored in an
+    inverted index, so finding the closest answers only touches answers that
+    share a reasonably rare feature with the query.
+    """
+
+    def __init__(self, answers, max_df_ratio=0.05, max_query_features=12):
+        self.max_query_features = max_query_features
+        self.answers = []
+        self._ids = {}
+        for answer in answers:
+            normalized = normalize_answer(answer)
+            if normalized not in self._ids:
+                self._ids[normalized] = len(self.answers)
+                self.answers.append(answer)
+
+        features = [_answer_features(normalize_answer(a)) for a in self.answers]
+        total = len(self.answers)
+        doc_freq = Counter(f for answer_features in features for f in answer_features)
+        # Features shared by a big part of the deck don't discriminate; skip them
+        cutoff = max(25, max_df_ratio * total)
+        self._idf = {
+            f: math.log(1 + total / count) for f, count in doc_freq.items() if count <= cutoff
+        }
+
+        self._weights = []
+        self._postings = defaultdict(list)
+        for answer_id, answer_features in enumerate(features):
+            weights = self._weigh(answer_features)
+            self._weights.append(weights)
+            for feature in weights:
+                self._postings[feature].append(answer_id)
+        self._norms = [math.sqrt(sum(w * w for w in weights.values())) or 1.0 for weights in self._weights]
+        self._closest = {}
+
+    def _weigh(self, features):
+        return {f: self._idf[f] for f in features if f in self._idf}
+
+    def closest(self, answer, count=3):
+        """The count answers most similar to (but not the same as) answer"""
+        normalized = normalize_answer(answer)
+        answer_id = self._ids.get(normalized)
+        key = (answer_id, count) if answer_id is not None else None
+        if key in self._closest:
+            return list(self._closest[key])
+
+        weights = self._weights[answer_id] if answer_id is not None else self._weigh(_answer_features(normalized))
+        # Only walk the postings of the query's rarest (most telling) features
+        # that another answer actually shares
+        query = heapq.nlargest(
+            self.max_query_features,
+            ((f, w) for f, w in weights.items() if len(self._postings.get(f, ())) > 1),
+            key=lambda item: item[1]
+        )
+        scores = defaultdict(float)
+        for feature, weight in query:
+            for other_id in self._postings.get(feature, ()):
+                scores[other_id] += weight * self._weights[other_id][feature]
+        scores.pop(answer_id, None)
+
+        best = heapq.nlargest(count, scores, key=lambda other_id: scores[other_id] / self._norms[other_id])
+        closest = [self.answers[other_id] for other_id in best]
+        if key is not None:
+            self._closest[key] = closest
+        return list(closest)
+
+    def random_others(self, answer, count, exclude=()):
+        """Up to count random answers different from answer and exclude"""
+        skip = {normalize_answer(a) for a in exclude}
+        skip.add(normalize_answer(answer))
+        available = len(self.answers) - len(skip & self._ids.keys())
+        picks = []
+        while len(picks) < min(count, available):
+            candidate = random.choice(self.answers)
+            if normalize_answer(candidate) not in skip:
+                skip.add(normalize_answer(candidate))
+                picks.append(candidate)
+        return picks
+
+
+def generate_fake_answers(correct_answer, all_answers, count=3, distractor_index=None):
+    """Generate plausible fake answers (the closest other answers in the deck)"""
+    index = distractor_index or DistractorIndex(all_answers)
     
-    # Remove correct answer from pool
-    available_answers = [a for a in all_answers if a.lower().strip() != correct_answer.lower().strip()]
+    # Use the most similar real answers as distractors
+    fake_answers = index.closest(correct_answer, count)
     
-    if len(available_answers) >= count:
-        # Use other real answers as distractors
-        fake_answers = random.sample(available_answers, count)
-    else:
-        # If not enough real answers, use what we have
-        fake_answers = available_answers.copy()
-        
-        # Fill remaining with variations
-        while len(fake_answers) < count:
-            variation = _create_variation(correct_answer)
-            if variation not in fake_answers:
-                fake_answers.append(variation)
+    # Answers sharing no features with the correct one: any other real answer will do
+    fake_answers += index.random_others(correct_answer, count - len(fake_answers), exclude=fake_answers)
+    
+    # If not enough real answers, fill remaining with variations
+    while len(fake_answers) < count:
+        variation = _create_variation(correct_answer)
+        if variation not in fake_answers:
+            fake_answers.append(variation)
     
     return fake_answers
 
@@ -48,13 +147,17 @@ def generate_true_false_statement(question, answer, is_true=True):
         return f"{question.rstrip('?')} → {fake_answer}"
 
 
-def create_multiple_choice_question(card, all_cards):
-    """Create a multiple choice question from a card"""
+def create_multiple_choice_question(card, all_cards, distractor_index=None):
+    """
+    Create a multiple choice question from a card.
+    Pass the deck's DistractorIndex to avoid rebuilding it for every question.
+    """
     correct_answer = card["answer"]
-    all_answers = [c["answer"] for c in all_cards]
+    if distractor_index is None:
+        distractor_index = DistractorIndex(c["answer"] for c in all_cards)
     
     # Generate 3 fake answers
-    fake_answers = generate_fake_answers(correct_answer, all_answers, count=3)
+    fake_answers = generate_fake_answers(correct_answer, None, count=3, distractor_index=distractor_index)
     
     # Combine and shuffle
     all_options = fake_answers + [correct_answer]
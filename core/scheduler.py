@@ -0,0 +1,217 @@
+# core/scheduler.py
+"""SM-2 spaced repetition scheduling and the per-session due-queue"""
+import heapq
+import itertools
+import sys
+import weakref
+from collections import deque
+from datetime import timedelta
+
+
+# Starting ease factor and the lowest it can fall to (SM-2)
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# A missed card comes back this soon, within the same session
+RELEARN_DELAY = timedelta(minutes=1)
+# A card moved past without being graded (flashcard Next) comes back after this
+SKIP_DELAY = timedelta(minutes=5)
+
+# Response times that grade a correct answer as easy / hard
+FAST_SECONDS = 5
+SLOW_SECONDS = 15
+
+
+def answer_quality(correct, response_time=None):
+    """
+    SM-2 quality (0-5) of an answer
+    Wrong answers are 1; right ones are 5, 4 or 3 depending on how long they took.
+    """
+    if not correct:
+        return 1
+    if response_time is None or response_time <= FAST_SECONDS:
+        return 5
+    return 4 if response_time <= SLOW_SECONDS else 3
+
+
+def schedule_review(state, correct, response_time, now):
+    """
+    Apply one review to a card's state
+    Args:
+        state: The card's review state (None for a card never reviewed)
+        correct: Whether the answer was right
+        response_time: Seconds taken to answer
+        now: Time of the review (naive UTC datetime)
+    Returns:
+        dict: New state with ease, interval (days), reps, lapses and due_at
+    """
+    state = state or {}
+    quality = answer_quality(correct, response_time)
+    ease = state.get("ease", DEFAULT_EASE)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    reps = state.get("reps", 0)
+    lapses = state.get("lapses", 0)
+
+    if quality < 3:
+        reps, lapses, interval = 0, lapses + 1, 0
+        due_at = now + RELEARN_DELAY
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1
+        elif reps == 2:
+            interval = 6
+        else:
+            interval = max(1, round(state.get("interval", 1) * ease))
+        due_at = now + timedelta(days=interval)
+
+    return {"ease": ease, "interval": interval, "reps": reps, "lapses": lapses, "due_at": due_at}
+
+
+class DueQueue:
+    """
+    Order in which one user studies one deck: due cards first (earliest due),
+    then cards never seen (in deck order), then cards not yet due.
+    Due cards are kept in a heap, so taking the next one is O(log n).
+    
+    Cards are identified by their position in a shared deck (anything with
+    .ids and .positions, e.g. data.card_source.SharedDeck), so a session
+    holds state only for the cards it has reviewed or skipped.
+    """
+
+    def __init__(self, username, deck_name, states=None):
+        self.username = username
+        self.deck_name = deck_name
+        self.deck = None
+        # Review states loaded by card id; moved to self.states on sync
+        self._saved_states = dict(states or {})
+        self.states = {}
+        self._heap = []
+        # position -> due time of its live heap entry (older entries are skipped)
+        self._due = {}
+        # Next position to consider as a new card, and new cards put back
+        self._new_cursor = 0
+        self._skipped_new = deque()
+        self._seq = itertools.count()
+        _live_queues.add(self)
+
+    def sync(self, deck):
+        """Switch to the deck's current version, carrying state over by card id"""
+        if deck is self.deck:
+            return
+        if self.deck is not None:
+            old_ids = self.deck.ids
+            self._saved_states = {old_ids[p]: state for p, state in self.states.items()}
+            due = {old_ids[p]: due_at for p, due_at in self._due.items()}
+            skipped = [old_ids[p] for p in self._skipped_new]
+        else:
+            due, skipped = {}, []
+        
+        self.deck = deck
+        self.states = {
+            deck.positions[card_id]: state
+            for card_id, state in self._saved_states.items()
+            if card_id in deck.positions
+        }
+        self._saved_states = {}
+        self._heap = []
+        self._due = {}
+        for position, state in self.states.items():
+            card_id = deck.ids[position]
+            self.push(position, due.get(card_id, state["due_at"]))
+        self._skipped_new = deque(deck.positions[c] for c in skipped if c in deck.positions)
+        self._new_cursor = 0
+
+    def __len__(self):
+        return len(self.deck.ids) if self.deck is not None else 0
+
+    def card_id(self, position):
+        return self.deck.ids[position]
+
+    def push(self, position, due_at):
+        """Queue (or requeue) a card to come up at due_at"""
+        self._due[position] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._seq), position))
+
+    def review(self, position, correct, response_time, now):
+        """Schedule a card after it was answered; returns its new state"""
+        state = schedule_review(self.states.get(position), correct, response_time, now)
+        self.states[position] = state
+        self.push(position, state["due_at"])
+        return state
+
+    def postpone(self, position, now):
+        """Put back a card that was shown but not graded"""
+        if position in self._due or position in self._skipped_new:
+            return
+        if position in self.states:
+            self.push(position, now + SKIP_DELAY)
+        else:
+            self._skipped_new.append(position)
+
+    def _is_new(self, position):
+        return position not in self.states and position not in self._due
+
+    def _peek_due(self):
+        while self._heap:
+            due_at, _, position = self._heap[0]
+            if self._due.get(position) == due_at:
+                return due_at, position
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop_new(self):
+        while self._new_cursor < len(self):
+            position = self._new_cursor
+            self._new_cursor += 1
+            if self._is_new(position):
+                return position
+        while self._skipped_new:
+            position = self._skipped_new.popleft()
+            if self._is_new(position):
+                return position
+        return None
+
+    def pop_next(self, now):
+        """Take the position of the card to study next (None if the deck is empty)"""
+        top = self._peek_due()
+        if top is None or top[0] > now:
+            position = self._pop_new()
+            if position is not None:
+                return position
+        if top is None:
+            return None
+        heapq.heappop(self._heap)
+        del self._due[top[1]]
+        return top[1]
+
+    def upcoming(self, count, now):
+        """Positions of the next cards pop_next would return if no card were answered"""
+        live = heapq.nsmallest(count, (entry for entry in self._heap if self._due.get(entry[2]) == entry[0]))
+        new = itertools.islice(
+            (p for p in itertools.chain(range(self._new_cursor, len(self)), self._skipped_new) if self._is_new(p)),
+            count
+        )
+        order = [e[2] for e in live if e[0] <= now] + list(new) + [e[2] for e in live if e[0] > now]
+        return list(dict.fromkeys(order))[:count]
+
+    def counts(self, now):
+        """(due now, never reviewed) card counts"""
+        due = sum(1 for due_at in self._due.values() if due_at <= now)
+        return due, len(self) - len(self.states)
+
+    def memory_bytes(self):
+        """Approximate memory this session's queue holds"""
+        size = sys.getsizeof(self.__dict__) + sys.getsizeof(self._heap) + sys.getsizeof(self._due)
+        size += sys.getsizeof(self.states) + sys.getsizeof(self._skipped_new)
+        size += sum(sys.getsizeof(entry) for entry in self._heap)
+        size += sum(sys.getsizeof(state) for state in self.states.values())
+        return size
+
+
+_live_queues = weakref.WeakSet()
+
+
+def live_queues():
+    """Study queues currently held by sessions in this process"""
+    return list(_live_queues)
@@ -16,3 +16,23 @@ def calculate_points(correct):
     else:
         return WRONG_PENALTY
     
+
+
+def project_score(user, points, correct, verified=False):
+    """
+    The user document as it will be after update_user_score(points, correct, verified)
+    (used to show the new score before the write has reached the database)
+    """
+    user = dict(user or {})
+    user["total_score"] = user.get("total_score", 0) + points
+    user["cards_studied"] = user.get("cards_studied", 0) + 1
+    user["current_streak"] = user.get("current_streak", 0) + 1 if correct else 0
+    user["best_streak"] = max(user.get("best_streak", 0), user["current_streak"])
+    
+    field = "correct_answers" if correct else "incorrect_answers"
+    user[field] = user.get(field, 0) + 1
+    if verified:
+        field = "verification_passed" if correct else "verification_failed"
+        user[field] = user.get(field, 0) + 1
+    
+    return user
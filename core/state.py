@@ -1,98 +1,101 @@
 # core/state.py
 import streamlit as st
-import random
-import secrets
+from datetime import datetime
+from core.scheduler import DueQueue
+from data.card_source import WINDOW_SIZE
+from data.review_store import load_review_states, save_review_state
+from data.write_behind import get_write_behind
 
 
-def init_auth_state():
-    """Initialize authentication state if not present"""
-    if "username" not in st.session_state:
-        st.session_state.username = None
-
-
-def set_user(username):
-    """Set the logged-in user with a session token"""
-    # Generate a random session token
-    token = secrets.token_urlsafe(32)
-    st.session_state.username = username
-    st.session_state.session_token = token
-    
-    # Store token in query params for persistence
-    st.query_params["session"] = token
-    
-    # Store mapping in session state (in production, use database)
-    if "session_tokens" not in st.session_state:
-        st.session_state.session_tokens = {}
-    st.session_state.session_tokens[token] = username
-
-
-def get_current_user():
-    """Get the currently logged-in username or None"""
-    # First check session state
-    if st.session_state.get("username"):
-        return st.session_state.username
-    
-    # Check if there's a session token in query params
-    if "session" in st.query_params:
-        token = st.query_params["session"]
-        if "session_tokens" not in st.session_state:
-            st.session_state.session_tokens = {}
-        
-        # Check if token is valid
-        if token in st.session_state.session_tokens:
-            username = st.session_state.session_tokens[token]
-            st.session_state.username = username
-            return username
-    
-    return None
-
-
-def logout_user():
-    """Clear user authentication"""
-    # Remove token from mapping
-    if st.session_state.get("session_token"):
-        token = st.session_state.session_token
-        if "session_tokens" in st.session_state and token in st.session_state.session_tokens:
-            del st.session_state.session_tokens[token]
-    
-    # Clear session state
-    if "username" in st.session_state:
-        del st.session_state.username
-    if "session_token" in st.session_state:
-        del st.session_state.session_token
-    
-    # Clear query params
-    st.query_params.clear()
-
-
-def init_study_state(cards, deck_name=None):
+def init_study_state(deck, deck_name=None):
     """
-    Initialize or reset the study session state.
+    Initialize or update the study session state.
+    Cards come up in spaced repetition order (see core.scheduler): the queue
+    is built from the user's saved review states once per deck, then follows
+    the deck as cards are added or removed. The session holds only the queue
+    and the current card's id; cards are read from the shared deck.
     
     Args:
-        cards: List of flashcards
+        deck: The deck's SharedDeck (data.card_source.get_shared_deck)
         deck_name: Unique identifier for the current deck (e.g., deck name)
     """
-    # Check if we need to initialize or if deck has changed
-    current_deck = st.session_state.get("current_deck")
+    username = st.session_state.get("username")
+    queue = st.session_state.get("study_queue")
     
-    if "cards" not in st.session_state or current_deck != deck_name:
-        # Initialize/reset state
-        st.session_state.cards = list(cards)
-        random.shuffle(st.session_state.cards)
-        st.session_state.index = 0
+    if queue is None or queue.deck_name != deck_name or queue.username != username:
+        states = load_review_states(username, deck_name) if username else {}
+        queue = DueQueue(username, deck_name, states)
+        st.session_state.study_queue = queue
+        st.session_state.card_id = None
         st.session_state.current_deck = deck_name
+    queue.sync(deck)
+    
+    # The current card is tracked by id, which survives deck edits
+    if st.session_state.get("card_id") not in deck.positions:
+        position = queue.pop_next(datetime.utcnow())
+        st.session_state.card_id = deck.ids[position] if position is not None else None
     
     # Always initialize these if they don't exist (but don't reset if they do)
     if "show_answer" not in st.session_state:
         st.session_state.show_answer = False
-    if "index" not in st.session_state:
-        st.session_state.index = 0
+
+
+def current_card():
+    """The card being studied (loading its window of cards if needed)"""
+    queue = st.session_state.get("study_queue")
+    card_id = st.session_state.get("card_id")
+    if queue is None or queue.deck is None or card_id not in queue.deck.positions:
+        return None
+    deck = queue.deck
+    position = deck.positions[card_id]
+    card = deck.peek(position)
+    if card is not None:
+        return card
+    return deck.card(position, queue.upcoming(WINDOW_SIZE, datetime.utcnow()))
+
+
+def advance_card():
+    """Move to the next card in the study queue, prefetching the cards after it"""
+    queue = st.session_state.get("study_queue")
+    if queue is None or queue.deck is None:
+        return
+    deck = queue.deck
+    now = datetime.utcnow()
+    
+    # A card moved past without an answer comes back later
+    if st.session_state.get("card_id") in deck.positions:
+        queue.postpone(deck.positions[st.session_state.card_id], now)
+    
+    position = queue.pop_next(now)
+    st.session_state.card_id = deck.ids[position] if position is not None else None
+    st.session_state.show_answer = False
+    
+    if position is not None:
+        deck.prefetch([position] + queue.upcoming(WINDOW_SIZE - 1, now))
+
+
+def record_review(card, correct, response_time):
+    """Reschedule an answered card and save its review state"""
+    queue = st.session_state.get("study_queue")
+    if queue is None or queue.deck is None or card.get("_id") not in queue.deck.positions:
+        return
+    position = queue.deck.positions[card["_id"]]
+    state = queue.review(position, correct, response_time, datetime.utcnow())
+    if queue.username:
+        get_write_behind().submit(
+            queue.username, save_review_state, queue.username, queue.deck_name, card["_id"], state
+        )
+
+
+def study_queue_counts():
+    """(due now, never seen) card counts for the current deck"""
+    queue = st.session_state.get("study_queue")
+    return queue.counts(datetime.utcnow()) if queue else (0, 0)
 
 
 def reset_study_state():
     """Clear all study-related session state"""
-    keys_to_clear = ["cards", "index", "show_answer", "current_deck"]
+    keys_to_clear = ["show_answer", "current_deck", "study_queue", "card_id"]
     for key in keys_to_clear:
         if key in st.session_state:
             del st.session_state[key]
@@ -0,0 +1,300 @@
+# data/analytics.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from data.db import get_db, update_versioned
+from data.rollups import ROLLUP_COLLECTION
+from data.session_store import find_sessions
+
+# Personal study analytics, one document per user, updated as study sessions
+# are written (see data.log_writer):
+#   {"_id": username, "seeded": bool,
+#    "totals": {"answers", "correct", "response_time"},
+#    "decks": [{"deck", "answers", "correct", "response_time"}],
+#    "cards": [{"card": card _id, "deck", "answers", "wrong", "response_time"}],
+#    "days": [{"day": datetime, "answers", "correct", "response_time"}],
+#    "updated_at": datetime,
+#    "version": ObjectId (new on every write; see data.db.update_versioned)}
+# response_time values are sums in seconds. The stats tab reads one document.
+ANALYTICS_COLLECTION = "user_analytics"
+
+# Days of history kept for the heatmap and response-time trend
+HEATMAP_DAYS = 182
+# Per-card counters kept per user (the most missed cards win)
+MAX_TRACKED_CARDS = 300
+# A card needs this many answers before it can be one of the hardest
+MIN_CARD_ANSWERS = 3
+HARDEST_CARDS = 10
+
+# Analytics views are reused for this long before being read again
+ANALYTICS_FRESHNESS_SECONDS = 30
+
+# username -> (view, fetched_at)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _day(timestamp):
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def new_analytics(username):
+    return {
+        "_id": username,
+        "seeded": False,
+        "totals": {"answers": 0, "correct": 0, "response_time": 0},
+        "decks": [],
+        "cards": [],
+        "days": []
+    }
+
+
+class _Tally:
+    """An analytics document's lists indexed by key while a batch is applied"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.decks = {entry["deck"]: entry for entry in doc["decks"]}
+        self.cards = {entry["card"]: entry for entry in doc["cards"]}
+        self.days = {entry["day"]: entry for entry in doc["days"]}
+
+    def add(self, deck_name, card_id, timestamp, correct, response_time):
+        for counts in (
+            self.doc["totals"],
+            self.decks.setdefault(deck_name, {"deck": deck_name, "answers": 0, "correct": 0, "response_time": 0}),
+            self.days.setdefault(_day(timestamp), {"day": _day(timestamp), "answers": 0, "correct": 0, "response_time": 0}),
+        ):
+            counts["answers"] += 1
+            counts["correct"] += int(correct)
+            counts["response_time"] += response_time
+        if card_id is not None:
+            card = self.cards.setdefault(
+                card_id, {"card": card_id, "deck": deck_name, "answers": 0, "wrong": 0, "response_time": 0}
+            )
+            card["answers"] += 1
+            card["wrong"] += int(not correct)
+            card["response_time"] += response_time
+
+    def add_session(self, session):
+        self.add(
+            session["deck_name"], session.get("card_id"), session["timestamp"],
+            bool(session.get("correct")), session.get("response_time") or 0
+        )
+
+    def regrade(self, session):
+        """Move a regraded answer from wrong to correct or back (counts kept for days still shown)"""
+        change = 1 if session["correct"] else -1
+        self.doc["totals"]["correct"] += change
+        for entry in (
+            self.decks.get(session["deck_name"]),
+            self.days.get(_day(session["timestamp"])),
+        ):
+            if entry is not None:
+                entry["correct"] += change
+        card = self.cards.get(session.get("card_id"))
+        if card is not None:
+            card["wrong"] -= change
+
+    def finish(self, now):
+        """Write the indexed lists back to the document, trimmed to their limits"""
+        cutoff = _day(now) - timedelta(days=HEATMAP_DAYS - 1)
+        self.doc["decks"] = sorted(self.decks.values(), key=lambda entry: entry["deck"])
+        self.doc["days"] = sorted((d for d in self.days.values() if d["day"] >= cutoff), key=lambda d: d["day"])
+        self.doc["cards"] = sorted(
+            self.cards.values(), key=lambda card: (card["wrong"], card["answers"]), reverse=True
+        )[:MAX_TRACKED_CARDS]
+        self.doc["updated_at"] = now
+        return self.doc
+
+
+def apply_analytics(collection, sessions):
+    """
+    Add a batch of written study sessions to their users' analytics
+    (one read and one bulk write per batch, plus a retry for users another
+    process updated at the same time)
+    """
+    def update(usernames, docs):
+        tallies = {username: _Tally(docs.get(username) or new_analytics(username)) for username in usernames}
+        for session in sessions:
+            if session["username"] in tallies:
+                tallies[session["username"]].add_session(session)
+        now = datetime.utcnow()
+        return {username: tally.finish(now) for username, tally in tallies.items()}
+
+    usernames = list({session["username"] for session in sessions})
+    if not usernames:
+        return
+    _write_analytics(collection, usernames, update)
+
+    with _cache_lock:
+        for username in usernames:
+            _cache.pop(username, None)
+
+
+def apply_analytics_regrades(collection, regraded):
+    """
+    Apply regraded answers to their users' analytics
+    Args:
+        regraded: study sessions with their new "correct"
+    """
+    def update(usernames, docs):
+        # Users without analytics yet are built from the corrected history
+        tallies = {username: _Tally(doc) for username, doc in docs.items()}
+        for session in regraded:
+            if session["username"] in tallies:
+                tallies[session["username"]].regrade(session)
+        now = datetime.utcnow()
+        return {username: tally.finish(now) for username, tally in tallies.items()}
+
+    usernames = list({session["username"] for session in regraded})
+    if not usernames:
+        return
+    _write_analytics(collection, usernames, update)
+
+
+def _write_analytics(collection, usernames, update):
+    """Apply update to the users' analytics (see data.db.update_versioned) and drop their cached views"""
+    try:
+        conflicts = update_versioned(collection, usernames, update)
+        if conflicts:
+            print(f"Error updating {collection.name}: gave up on {len(conflicts)} user(s) after repeated conflicts")
+    except Exception as e:
+        print(f"Error updating {collection.name}: {e}")
+        return
+
+    with _cache_lock:
+        for username in usernames:
+            _cache.pop(username, None)
+
+
+def clear_user_analytics(username):
+    """Forget a user's analytics (e.g. after their score was reset)"""
+    db = get_db()
+    db[ANALYTICS_COLLECTION].delete_one({"_id": username})
+    with _cache_lock:
+        _cache.pop(username, None)
+
+
+def rebuild_user_analytics(username):
+    """
+    Recompute a user's analytics from history: deck totals and days from the
+    daily rollups, per-card counters from the raw sessions still kept
+    """
+    db = get_db()
+    tally = _Tally(new_analytics(username))
+    for rollup in db[ROLLUP_COLLECTION].find({"username": username}):
+        for counts in (
+            tally.doc["totals"],
+            tally.decks.setdefault(rollup["deck_name"], {"deck": rollup["deck_name"], "answers": 0, "correct": 0, "response_time": 0}),
+            tally.days.setdefault(rollup["day"], {"day": rollup["day"], "answers": 0, "correct": 0, "response_time": 0}),
+        ):
+            for field in ("answers", "correct", "response_time"):
+                counts[field] += rollup.get(field, 0)
+
+    for session in find_sessions({"username": username}):
+        card_id = session.get("card_id")
+        if card_id is None:
+            continue
+        card = tally.cards.setdefault(
+            card_id, {"card": card_id, "deck": session["deck_name"], "answers": 0, "wrong": 0, "response_time": 0}
+        )
+        card["answers"] += 1
+        card["wrong"] += int(not session.get("correct"))
+        card["response_time"] += session.get("response_time") or 0
+
+    doc = tally.finish(datetime.utcnow())
+    doc["seeded"] = True
+    # A new version, so batches that read the old document retry on this one
+    doc["version"] = ObjectId()
+    db[ANALYTICS_COLLECTION].replace_one({"_id": username}, doc, upsert=True)
+    return doc
+
+
+def _ratio(part, whole):
+    return part / whole if whole else 0
+
+
+def _view(doc):
+    """Shape an analytics document for display"""
+    from data.deck_store import get_deck
+
+    decks = [
+        {
+            "deck": entry["deck"],
+            "answers": entry["answers"],
+            "accuracy": _ratio(entry["correct"], entry["answers"]) * 100,
+            "avg_time": _ratio(entry["response_time"], entry["answers"])
+        }
+        for entry in sorted(doc["decks"], key=lambda entry: entry["answers"], reverse=True)
+    ]
+
+    hardest = []
+    candidates = sorted(
+        (card for card in doc["cards"] if card["answers"] >= MIN_CARD_ANSWERS and card["wrong"]),
+        key=lambda card: (_ratio(card["wrong"], card["answers"]), card["wrong"]),
+        reverse=True
+    )
+    questions = {}
+    for card in candidates:
+        if card["deck"] not in questions:
+            # Process-wide deck cache; cards that were since deleted are skipped
+            questions[card["deck"]] = {c["_id"]: c["question"] for c in get_deck(card["deck"])}
+        question = questions[card["deck"]].get(card["card"])
+        if question is None:
+            continue
+        hardest.append({
+            "deck": card["deck"],
+            "question": question,
+            "answers": card["answers"],
+            "miss_rate": _ratio(card["wrong"], card["answers"]) * 100,
+            "avg_time": _ratio(card["response_time"], card["answers"])
+        })
+        if len(hardest) == HARDEST_CARDS:
+            break
+
+    days = [
+        {
+            "day": entry["day"],
+            "answers": entry["answers"],
+            "accuracy": _ratio(entry["correct"], entry["answers"]) * 100,
+            "avg_time": _ratio(entry["response_time"], entry["answers"])
+        }
+        for entry in doc["days"]
+    ]
+
+    return {
+        "totals": doc["totals"],
+        "decks": decks,
+        "hardest": hardest,
+        "days": days,
+        "updated_at": doc.get("updated_at")
+    }
+
+
+def get_user_analytics(username, max_age=ANALYTICS_FRESHNESS_SECONDS):
+    """
+    A user's study analytics, read in one fetch and shared for max_age seconds
+    Returns:
+        dict with "totals", "decks" (accuracy and average time per deck),
+        "hardest" cards, "days" (answers, accuracy and average time per day)
+        and "updated_at"
+    """
+    now = time.time()
+    with _cache_lock:
+        cached = _cache.get(username)
+    if cached and now - cached[1] < max_age:
+        return cached[0]
+
+    db = get_db()
+    doc = db[ANALYTICS_COLLECTION].find_one({"_id": username})
+    if doc is None or not doc.get("seeded"):
+        # First look since analytics existed: fold in the user's history
+        doc = rebuild_user_analytics(username)
+
+    view = _view(doc)
+    with _cache_lock:
+        _cache[username] = (view, now)
+    return view
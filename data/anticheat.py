@@ -0,0 +1,238 @@
+# data/anticheat.py
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+from data.db import get_db, update_versioned
+from data.session_store import SESSION_BUCKETS, sessions_from_bucket
+
+# Streaming anti-cheat state, one compact document per user, updated as study
+# sessions are written (see data.log_writer):
+#   {"_id": username, "answers": int, "ewma_time": float,
+#    "window": bytes (last WINDOW_SIZE answers, 1 bit each, newest lowest),
+#    "window_count": int, "verif_passed": int, "verif_total": int,
+#    "alerts": [{"check": str, "reason": str, "severity": str, "since": datetime}],
+#    "suspicious": bool, "updated_at": datetime,
+#    "version": ObjectId (new on every write; see data.db.update_versioned)}
+# The admin dashboard reads only the suspicious documents.
+DETECTOR_COLLECTION = "anticheat_state"
+
+# Accuracy is judged over the last WINDOW_SIZE answers
+WINDOW_SIZE = 100
+PERFECT_ACCURACY = 99.5
+# Response time is an exponentially weighted average spanning ~EWMA_SPAN answers
+EWMA_SPAN = 20
+EWMA_ALPHA = 2 / (EWMA_SPAN + 1)
+MIN_ANSWERS_FOR_SPEED = 20
+FAST_SECONDS = 1.0
+# Verification checks ("I knew it" answers that were spot-checked)
+MIN_VERIFICATIONS = 10
+MIN_VERIFICATION_RATE = 50
+
+_WINDOW_MASK = (1 << WINDOW_SIZE) - 1
+_WINDOW_BYTES = (WINDOW_SIZE + 7) // 8
+
+
+def new_state(username):
+    return {
+        "_id": username,
+        "answers": 0,
+        "ewma_time": None,
+        "window": bytes(_WINDOW_BYTES),
+        "window_count": 0,
+        "verif_passed": 0,
+        "verif_total": 0,
+        "alerts": [],
+        "suspicious": False
+    }
+
+
+def observe(state, session):
+    """Fold one study session (answer) into a user's detector state"""
+    response_time = session.get("response_time") or 0
+    correct = bool(session.get("correct"))
+
+    state["answers"] += 1
+    if state["ewma_time"] is None:
+        state["ewma_time"] = response_time
+    else:
+        state["ewma_time"] += EWMA_ALPHA * (response_time - state["ewma_time"])
+
+    window = int.from_bytes(state["window"], "big")
+    window = ((window << 1) | int(correct)) & _WINDOW_MASK
+    state["window"] = window.to_bytes(_WINDOW_BYTES, "big")
+    state["window_count"] = min(WINDOW_SIZE, state["window_count"] + 1)
+
+    if session.get("verified"):
+        state["verif_total"] += 1
+        state["verif_passed"] += int(correct)
+
+
+def seed_verification(state, user):
+    """
+    Take a user's verification counts from their user document, which has
+    counted them since before the detector existed
+    """
+    passed = user.get("verification_passed", 0)
+    total = passed + user.get("verification_failed", 0)
+    if total > state["verif_total"]:
+        state["verif_passed"] = passed
+        state["verif_total"] = total
+
+
+def window_accuracy(state):
+    """Percent correct over the sliding window"""
+    if not state["window_count"]:
+        return 0
+    return bin(int.from_bytes(state["window"], "big")).count("1") / state["window_count"] * 100
+
+
+def evaluate(state, now):
+    """
+    Raise or clear the state's alerts from its current statistics.
+    An alert that stays raised keeps the time it was first raised.
+    """
+    alerts = []
+
+    # Only flag literally perfect accuracy over a full window
+    accuracy = window_accuracy(state)
+    if state["window_count"] >= WINDOW_SIZE and accuracy >= PERFECT_ACCURACY:
+        alerts.append({
+            "check": "accuracy",
+            "reason": f"Suspiciously perfect accuracy: {accuracy:.1f}% over the last {state['window_count']} cards",
+            "severity": "medium"
+        })
+
+    # Failed verification checks (this is the real cheater detector)
+    if state["verif_total"] >= MIN_VERIFICATIONS:
+        rate = state["verif_passed"] / state["verif_total"] * 100
+        if rate < MIN_VERIFICATION_RATE:
+            alerts.append({
+                "check": "verification",
+                "reason": f"Low verification accuracy: {rate:.1f}% (likely clicking 'Got it' without knowing)",
+                "severity": "high"
+            })
+
+    # Impossible speed (likely auto-clicking)
+    if state["answers"] >= MIN_ANSWERS_FOR_SPEED and state["ewma_time"] < FAST_SECONDS:
+        alerts.append({
+            "check": "speed",
+            "reason": f"Impossibly fast responses: {state['ewma_time']:.1f}s average",
+            "severity": "high"
+        })
+
+    raised = {alert["check"]: alert["since"] for alert in state["alerts"]}
+    for alert in alerts:
+        alert["since"] = raised.get(alert["check"], now)
+    state["alerts"] = alerts
+    state["suspicious"] = bool(alerts)
+    state["updated_at"] = now
+
+
+def apply_detector(collection, sessions):
+    """
+    Update the detector state of every user in a batch of written study
+    sessions (one read and one bulk write per batch, plus a retry for users
+    another process updated at the same time)
+    """
+    def update(usernames, states):
+        missing = [username for username in usernames if username not in states]
+        for username in missing:
+            states[username] = new_state(username)
+        for session in sessions:
+            if session["username"] in states:
+                observe(states[session["username"]], session)
+        if missing:
+            # First answers since the detector existed: start from the user's
+            # verification history rather than from zero
+            for user in collection.database.users.find(
+                {"_id": {"$in": missing}}, {"verification_passed": 1, "verification_failed": 1}
+            ):
+                seed_verification(states[user["_id"]], user)
+
+        now = datetime.utcnow()
+        for state in states.values():
+            evaluate(state, now)
+        return states
+
+    usernames = list({session["username"] for session in sessions})
+    if not usernames:
+        return
+    try:
+        conflicts = update_versioned(collection, usernames, update)
+        if conflicts:
+            print(f"Error updating {collection.name}: gave up on {len(conflicts)} user(s) after repeated conflicts")
+    except Exception as e:
+        print(f"Error updating {collection.name}: {e}")
+
+
+def get_alerts():
+    """
+    Current alerts of every suspicious user
+    Returns:
+        list of dicts with username, reason, severity and since
+    """
+    db = get_db()
+    alerts = []
+    for state in db[DETECTOR_COLLECTION].find({"suspicious": True}, {"alerts": 1}):
+        for alert in state["alerts"]:
+            alerts.append({"username": state["_id"], **{k: alert[k] for k in ("reason", "severity", "since")}})
+    return alerts
+
+
+def clear_detector_state(username):
+    """Forget a user's statistics (e.g. after their score was reset)"""
+    db = get_db()
+    db[DETECTOR_COLLECTION].delete_one({"_id": username})
+
+
+def rebuild_detector_state():
+    """
+    Recompute every user's detector state (run once for users who studied
+    before the detector existed). Sessions logged then don't record whether
+    they were verification checks, so verification counts come from the user
+    document; the window and response time are replayed from each user's
+    most recent sessions. States are replaced in place (alerts never
+    disappear while it runs); states of deleted users are removed last.
+    """
+    db = get_db()
+    collection = db[DETECTOR_COLLECTION]
+    now = datetime.utcnow()
+
+    # Every user's most recent buckets in one aggregation; each bucket holds
+    # at least one answer, so WINDOW_SIZE buckets cover the window
+    recent = {}
+    for group in db[SESSION_BUCKETS].aggregate([
+        {"$group": {
+            "_id": "$username",
+            "buckets": {"$topN": {
+                "n": WINDOW_SIZE,
+                "sortBy": {"start": -1},
+                "output": {"_id": "$_id", "deck_name": "$deck_name", "events": "$events"}
+            }}
+        }}
+    ], allowDiskUse=True):
+        sessions = []
+        for bucket in group["buckets"]:
+            sessions.extend(sessions_from_bucket({**bucket, "username": group["_id"]}))
+        sessions.sort(key=lambda session: session["timestamp"])
+        recent[group["_id"]] = sessions[-WINDOW_SIZE:]
+
+    usernames = []
+    replacements = []
+    for user in db.users.find({}, {"verification_passed": 1, "verification_failed": 1}):
+        username = user["_id"]
+        state = new_state(username)
+        for session in recent.get(username, []):
+            observe(state, session)
+        seed_verification(state, user)
+        evaluate(state, now)
+        # A new version, so batches that read the old state retry on this one
+        state["version"] = ObjectId()
+        usernames.append(username)
+        replacements.append(ReplaceOne({"_id": username}, state, upsert=True))
+
+    if replacements:
+        collection.bulk_write(replacements, ordered=False)
+    collection.delete_many({"_id": {"$nin": usernames}})
@@ -0,0 +1,197 @@
+# data/card_source.py
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from data.db import get_db
+from data.deck_store import get_card_ids
+
+# Study sessions read cards from one read-only SharedDeck per deck and
+# process; a session itself only holds positions into it (see
+# core.scheduler.DueQueue). Cards are loaded into the shared deck a window at
+# a time: the card being shown plus the next ones the session will need, and
+# while a window is studied the following one is fetched in the background.
+# Only text and image references are loaded; image bytes are fetched when a
+# card is revealed.
+WINDOW_SIZE = 50
+# Prefetch the next window once fewer than this many upcoming cards are loaded
+PREFETCH_THRESHOLD = 10
+# Fields a study session needs from a card
+STUDY_FIELDS = {"question": 1, "answer": 1, "image_id": 1, "image": 1}
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="card-prefetch")
+
+# deck name -> SharedDeck for the deck's current card ids
+_shared_decks = {}
+_shared_decks_lock = threading.Lock()
+
+
+class Card:
+    """
+    A read-only card. Reads like the card dicts used elsewhere
+    (card["question"], card.get("image_id")) but without a per-card dict.
+    """
+    __slots__ = ("_id", "question", "answer", "image_id", "image")
+
+    def __init__(self, doc):
+        for field in self.__slots__:
+            if field in doc:
+                object.__setattr__(self, field, doc[field])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is read-only")
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+def _fetch(collection, card_ids):
+    return list(collection.find({"_id": {"$in": list(card_ids)}}, STUDY_FIELDS))
+
+
+class SharedDeck:
+    """
+    One process-wide copy of a deck's cards, shared by every session studying
+    it. The card ids are fixed; card slots are filled in as windows load.
+    """
+
+    def __init__(self, name, card_ids):
+        self.name = name
+        self.ids = card_ids
+        self.positions = {card_id: position for position, card_id in enumerate(card_ids)}
+        self._cards = [None] * len(card_ids)
+        # position -> Future of the background load that will fill it
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def loaded(self):
+        """Number of cards loaded so far"""
+        return sum(1 for card in self._cards if card is not None)
+
+    def _load(self, collection, positions):
+        try:
+            for doc in _fetch(collection, [self.ids[p] for p in positions]):
+                position = self.positions.get(doc["_id"])
+                if position is not None:
+                    self._cards[position] = Card(doc)
+        finally:
+            with self._lock:
+                for position in positions:
+                    self._inflight.pop(position, None)
+
+    def _missing(self, positions):
+        return [p for p in positions if self._cards[p] is None and p not in self._inflight]
+
+    def peek(self, position):
+        """The card at a position if it is loaded, else None"""
+        return self._cards[position]
+
+    def card(self, position, upcoming=()):
+        """
+        Get the card at a position, loading it (with the upcoming ones) if needed
+        Args:
+            position: Position of the card in deck order
+            upcoming: positions expected next, loaded in the same round trip
+        """
+        card = self._cards[position]
+        if card is not None:
+            return card
+
+        with self._lock:
+            pending = self._inflight.get(position)
+        if pending is not None:
+            # Already being loaded for another session or by a prefetch
+            pending.exception()
+            if self._cards[position] is not None:
+                return self._cards[position]
+
+        with self._lock:
+            wanted = [position] + [p for p in self._missing(upcoming) if p != position]
+        self._load(get_db().cards, wanted[:WINDOW_SIZE])
+        return self._cards[position]
+
+    def prefetch(self, upcoming):
+        """Load the next window in the background if too few upcoming cards are loaded"""
+        upcoming = list(upcoming)[:WINDOW_SIZE]
+        if all(self._cards[p] is not None for p in upcoming[:PREFETCH_THRESHOLD]):
+            return
+        # The collection is resolved here so the worker never touches st.secrets
+        collection = get_db().cards
+        with self._lock:
+            wanted = self._missing(upcoming)
+            if not wanted:
+                return
+            future = _prefetch_pool.submit(self._load, collection, wanted)
+            for position in wanted:
+                self._inflight.setdefault(position, future)
+
+    def memory_bytes(self):
+        """Approximate memory held by this deck's index and loaded cards"""
+        size = sys.getsizeof(self.ids) + sys.getsizeof(self.positions) + sys.getsizeof(self._cards)
+        size += sum(sys.getsizeof(card_id) for card_id in self.ids)
+        for card in self._cards:
+            if card is not None:
+                size += sys.getsizeof(card)
+                size += sum(sys.getsizeof(card.get(field)) for field in ("question", "answer", "image_id"))
+        return size
+
+    def dict_copy_bytes(self):
+        """Approximate memory of the same loaded cards as one session's list of card dicts"""
+        loaded = [card for card in self._cards if card is not None]
+        size = sys.getsizeof(list(loaded))
+        for card in loaded:
+            doc = {field: card[field] for field in Card.__slots__ if field in card}
+            size += sys.getsizeof(doc) + sum(sys.getsizeof(value) for value in doc.values())
+        return size
+
+
+def get_shared_deck(deck_name):
+    """Get the process-wide SharedDeck for a deck's current version"""
+    card_ids = get_card_ids(deck_name)
+    deck = _shared_decks.get(deck_name)
+    if deck is None or deck.ids is not card_ids:
+        with _shared_decks_lock:
+            deck = _shared_decks.get(deck_name)
+            if deck is None or deck.ids is not card_ids:
+                deck = SharedDeck(deck_name, card_ids)
+                _shared_decks[deck_name] = deck
+    return deck
+
+
+def memory_report(queues=()):
+    """
+    Memory held by the shared decks vs. what per-session card lists would take
+    Args:
+        queues: The live study queues (core.scheduler.live_queues())
+    Returns:
+        list of dicts, one per shared deck, sizes in bytes
+    """
+    report = []
+    for name, deck in sorted(_shared_decks.items()):
+        sessions = [queue for queue in queues if queue.deck is deck]
+        session_bytes = sum(queue.memory_bytes() for queue in sessions)
+        shared_bytes = deck.memory_bytes()
+        copy_bytes = deck.dict_copy_bytes()
+        report.append({
+            "deck": name,
+            "cards": len(deck),
+            "loaded": deck.loaded(),
+            "sessions": len(sessions),
+            "shared_bytes": shared_bytes,
+            "per_session_bytes": session_bytes // len(sessions) if sessions else 0,
+            "per_session_copy_bytes": copy_bytes,
+            "saved_bytes": max(0, copy_bytes * len(sessions) - session_bytes - shared_bytes)
+        })
+    return report
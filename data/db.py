@@ -1,15 +1,157 @@
 # data/db.py
 import streamlit as st
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError
-import certifi
+from bson import ObjectId
+from pymongo import IndexModel, ReplaceOne
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+from streamlit_auth.connection import get_connection_manager
 
-_client = None
 _db = None
+_index_report = None
+
+# Raw study session buckets are kept this long; hourly rollups this long;
+# daily rollups are kept for good (see data.session_store and data.rollups)
+RAW_SESSION_RETENTION_DAYS = 30
+HOURLY_ROLLUP_RETENTION_DAYS = 180
+
+# Indexes the app's queries rely on, per collection.
+# decks are keyed by deck name in _id, so name lookups use the built-in _id index.
+INDEXES = {
+    "users": [
+        # get_leaderboard: sort by score, filter out flagged users from the index keys
+        IndexModel([("total_score", -1), ("flagged", 1)]),
+        # find_admins: only admin accounts are indexed
+        IndexModel([("is_admin", 1)], partialFilterExpression={"is_admin": True}),
+    ],
+    "cards": [
+        # Loading a deck in order
+        IndexModel([("deck", 1), ("position", 1)]),
+        # Checking whether any card still uses an image before deleting it
+        IndexModel([("image_id", 1)], partialFilterExpression={"image_id": {"$exists": True}}),
+        IndexModel([("thumbnail_id", 1)], partialFilterExpression={"thumbnail_id": {"$exists": True}}),
+    ],
+    "session_buckets": [
+        # One bucket per user, deck and hour (the upsert key); per-user history, most recent first
+        IndexModel([("username", 1), ("start", -1), ("deck_name", 1)], unique=True),
+        # Per-deck activity over time (regrading)
+        IndexModel([("deck_name", 1), ("start", -1)]),
+        # Raw sessions expire; the rollups keep their totals
+        IndexModel([("start", 1)], expireAfterSeconds=RAW_SESSION_RETENTION_DAYS * 86400),
+    ],
+    "reviews": [
+        # Loading a user's review states for a deck; one document per user and card
+        IndexModel([("username", 1), ("deck_name", 1), ("card_id", 1)], unique=True),
+    ],
+    "score_rollups": [
+        # One rollup per user, deck and day (the upsert key); per-deck windows
+        IndexModel([("deck_name", 1), ("day", 1), ("username", 1)], unique=True),
+        # All-deck windows
+        IndexModel([("day", 1)]),
+        # A user's history (rebuilding their analytics)
+        IndexModel([("username", 1), ("day", 1)]),
+    ],
+    "score_rollups_hourly": [
+        # One rollup per user, hour and deck (the upsert key); a user's recent activity
+        IndexModel([("username", 1), ("hour", 1), ("deck_name", 1)], unique=True),
+        IndexModel([("hour", 1)], expireAfterSeconds=HOURLY_ROLLUP_RETENTION_DAYS * 86400),
+    ],
+    "anticheat_state": [
+        # The admin dashboard: only users with raised alerts are indexed
+        IndexModel([("suspicious", 1)], partialFilterExpression={"suspicious": True}),
+    ],
+}
+
+
+def ensure_indexes(db):
+    """
+    Idempotently create the indexes declared in INDEXES and report on them.
+    Returns: dict with "created", "undeclared" and "unused" index lists
+    """
+    report = {"created": [], "undeclared": [], "unused": []}
+
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        try:
+            existing = set(collection.index_information())
+            declared = {model.document["name"] for model in models}
+
+            missing = [model for model in models if model.document["name"] not in existing]
+            if missing:
+                collection.create_indexes(missing)
+                report["created"] += [f"{collection_name}.{m.document['name']}" for m in missing]
+
+            report["undeclared"] += [
+                f"{collection_name}.{name}" for name in sorted(existing - declared - {"_id_"})
+            ]
+
+            # Usage counters since the server started (needs the indexStats privilege);
+            # indexes created just now have had no chance to be used yet
+            for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] == "_id_" or stats["name"] not in existing:
+                    continue
+                if stats.get("accesses", {}).get("ops", 0) == 0:
+                    report["unused"].append(f"{collection_name}.{stats['name']}")
+        except Exception as e:
+            print(f"Error ensuring indexes on {collection_name}: {e}")
+
+    for key, names in report.items():
+        if names:
+            print(f"Indexes {key}: {', '.join(names)}")
+
+    return report
+
+
+# Attempts at a versioned read-modify-write before the documents still in
+# conflict are given up on
+VERSIONED_WRITE_ATTEMPTS = 5
+DUPLICATE_KEY_ERROR = 11000
+
+
+def update_versioned(collection, ids, update):
+    """
+    Read-modify-write documents by _id without losing concurrent updates
+    (several app processes apply batches for the same users). A document is
+    written back only if its "version" is still the one that was read; the
+    ones another process wrote meanwhile are read and updated again.
+    Args:
+        ids: _ids of the documents to update
+        update: function(ids, docs) -> {_id: new document}, given the ids to
+            update and the current documents of those that exist
+    Returns:
+        list: the ids still in conflict after VERSIONED_WRITE_ATTEMPTS
+    """
+    pending = list(ids)
+    for _ in range(VERSIONED_WRITE_ATTEMPTS):
+        docs = {doc["_id"]: doc for doc in collection.find({"_id": {"$in": pending}})}
+        versions = {_id: doc.get("version") for _id, doc in docs.items()}
+        updated = update(pending, docs)
+        order = list(updated)
+        if not order:
+            return []
+        writes = []
+        for _id in order:
+            updated[_id]["version"] = ObjectId()
+            # A document that doesn't exist yet is inserted; if another process
+            # inserted it first, the upsert fails on the duplicate _id
+            writes.append(ReplaceOne({"_id": _id, "version": versions.get(_id)}, updated[_id], upsert=True))
+        try:
+            collection.bulk_write(writes, ordered=False)
+            return []
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            pending = [order[error["index"]] for error in errors]
+    return pending
+
+
+def get_index_report():
+    """Get the index report produced when this process connected"""
+    return _index_report
+
 
 def get_db():
     """Get MongoDB database connection with error handling"""
-    global _client, _db
+    global _db, _index_report
     
     if _db is not None:
         return _db
@@ -19,18 +161,17 @@ def get_db():
         mongo_uri = st.secrets["mongo"]["uri"]
         db_name = st.secrets["mongo"]["db_name"]
         
-        # Use certifi for SSL certificates
-        _client = MongoClient(
+        # Same shared client/pool as streamlit_auth (one pool, one ping per process)
+        manager = get_connection_manager(
             mongo_uri,
-            tlsCAFile=certifi.where(),
-            serverSelectionTimeoutMS=30000,
-            connectTimeoutMS=30000,
-            socketTimeoutMS=30000,
+            dict(st.secrets["mongo"].get("pool", {})),
+            bool(st.secrets["mongo"].get("instrument", False))
         )
+        db = manager.get_database(db_name)
         
-        # Test the connection
-        _client.admin.command('ping')
-        _db = _client[db_name]
+        # Schema bootstrap, once per process
+        _index_report = ensure_indexes(db)
+        _db = db
         
         return _db
         
@@ -1,5 +1,15 @@
 # data/deck_store.py
+import base64
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from core.quiz_generator import DistractorIndex
 from data.db import get_db
+from data.image_store import card_images_stored, delete_unused_images, ingest_image
 
 # # run once to sync in-memory decks to database
 # from data.decks import DECKS
@@ -11,42 +21,239 @@ from data.db import get_db
 #         upsert=True
 #     )
 # # end run once block
+# # (then call migrate_embedded_cards() to move them into the cards collection)
+
+# Cards live in their own collection, one document per card:
+#   {"_id": ObjectId, "deck": deck name, "position": int,
+#    "question": str, "answer": str, "image_id": optional image_store id,
+#    "thumbnail_id", "image_bytes_original", "image_bytes_stored": set with image_id}
+# Deck documents keep only metadata: {"_id": deck name, "version": ObjectId,
+# "next_position": int}. Cards are ordered by position; the "index" shown by
+# the manage tab is a card's offset in that order, but edits and deletes go by
+# card _id (the index can shift under a cached list).
+CARD_FIELDS = {"deck": 0}
+
+# Shared per-process deck cache: deck name -> (version, cards, checked_at).
+# Every writer below gives the deck a new "version" (a fresh ObjectId, so a
+# deck deleted and created again never repeats one), and a cached entry is
+# only trusted while its version still matches the one stored in MongoDB.
+# Version checks are themselves throttled to one per DECK_VERSION_CHECK_SECONDS
+# so that Flip/Next reruns are served entirely from memory.
+DECK_VERSION_CHECK_SECONDS = 5
+
+_deck_cache = {}
+# Same, for just the card ids: deck name -> (version, tuple of card _ids, checked_at)
+_card_ids_cache = {}
+_deck_cache_lock = threading.Lock()
+# deck name -> (cards list it was built from, DistractorIndex)
+_distractor_indexes = {}
+_cards_migrated = False
+# A deck claimed for migration by a process that stopped is taken over after this
+MIGRATION_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def _invalidate_deck_cache(*deck_names):
+    """Drop cached entries for the given decks"""
+    with _deck_cache_lock:
+        for name in deck_names:
+            _deck_cache.pop(name, None)
+            _card_ids_cache.pop(name, None)
+
+
+def _bump_version(db, deck_name):
+    db.decks.update_one({"_id": deck_name}, {"$set": {"version": ObjectId()}})
+    _invalidate_deck_cache(deck_name)
+
+
+def _get_cached(cache, deck_name, load):
+    """Return load(deck_name) from cache, reloading it only when the deck version changed"""
+    now = time.time()
+    with _deck_cache_lock:
+        entry = cache.get(deck_name)
+    
+    if entry and now - entry[2] < DECK_VERSION_CHECK_SECONDS:
+        return entry[1]
+    
+    db = get_db()
+    head = db.decks.find_one({"_id": deck_name}, {"version": 1})
+    if head is None:
+        _invalidate_deck_cache(deck_name)
+        return []
+    
+    version = head.get("version")
+    if entry and version == entry[0]:
+        value = entry[1]
+    else:
+        value = load(deck_name)
+    
+    with _deck_cache_lock:
+        cache[deck_name] = (version, value, now)
+    return value
+
+
+def _get_cached_cards(deck_name):
+    return _get_cached(_deck_cache, deck_name, get_cards)
+
+
+def migrate_embedded_cards():
+    """
+    Move cards embedded in deck documents into the cards collection.
+    Safe to call on every run: it does nothing once a process has migrated.
+    """
+    global _cards_migrated
+    
+    if _cards_migrated:
+        return
+    
+    db = get_db()
+    legacy_query = {"$or": [{"cards": {"$exists": True}}, {"legacy_cards": {"$exists": True}}]}
+    migrated_decks = False
+    for deck in db.decks.find(legacy_query, {"_id": 1}):
+        name = deck["_id"]
+        # Claim the deck: setting the embedded array aside is atomic, so only
+        # one process migrates it (and a re-run after a crash can resume)
+        now = datetime.utcnow()
+        claim = db.decks.update_one(
+            {"_id": name, "cards": {"$exists": True}},
+            {"$rename": {"cards": "legacy_cards"}, "$set": {"migration_claimed_at": now}}
+        )
+        if claim.modified_count == 0:
+            # Already set aside: resume only if whoever claimed it has gone quiet
+            claim = db.decks.update_one(
+                {
+                    "_id": name,
+                    "legacy_cards": {"$exists": True},
+                    "migration_claimed_at": {"$not": {"$gte": now - MIGRATION_CLAIM_TIMEOUT}}
+                },
+                {"$set": {"migration_claimed_at": now}}
+            )
+            if claim.modified_count == 0:
+                continue
+        legacy = db.decks.find_one({"_id": name}, {"legacy_cards": 1}).get("legacy_cards", [])
+        
+        # Replace any partial copy left by an interrupted run (only cards this
+        # migration inserted, never ones added to the deck meanwhile)
+        db.cards.delete_many({"deck": name, "migrated": True})
+        if legacy:
+            db.cards.insert_many([
+                {
+                    "deck": name,
+                    "position": position,
+                    "migrated": True,
+                    **{k: v for k, v in card.items() if k in ("question", "answer", "image")}
+                }
+                for position, card in enumerate(legacy)
+            ])
+        db.decks.update_one(
+            {"_id": name},
+            {
+                "$unset": {"legacy_cards": "", "migration_claimed_at": ""},
+                "$max": {"next_position": len(legacy)},
+                "$set": {"version": ObjectId()}
+            }
+        )
+        db.cards.update_many({"deck": name, "migrated": True}, {"$unset": {"migrated": ""}})
+        _invalidate_deck_cache(name)
+        migrated_decks = True
+    
+    # Move inline base64 images into the image store, leaving a reference.
+    # New cards never have inline images, so the scan only runs until it has
+    # once finished with no deck left to migrate.
+    if migrated_decks or not db.migrations.find_one({"_id": "card_images"}):
+        for card in db.cards.find({"image": {"$exists": True}}, {"deck": 1, "image": 1}):
+            db.cards.update_one(
+                {"_id": card["_id"], "image": {"$exists": True}},
+                {"$set": ingest_image(base64.b64decode(card["image"])), "$unset": {"image": ""}}
+            )
+            _bump_version(db, card["deck"])
+        if not db.decks.find_one(legacy_query, {"_id": 1}):
+            db.migrations.update_one(
+                {"_id": "card_images"}, {"$set": {"done_at": datetime.utcnow()}}, upsert=True
+            )
+    
+    _cards_migrated = True
+
 
 def get_deck_names():
     db = get_db()
     return sorted(db.decks.distinct("_id"))
 
 def get_deck(deck_name):
+    """Get a deck's cards (served from the shared deck cache)"""
+    return list(_get_cached_cards(deck_name))
+
+def get_card_ids(deck_name):
+    """
+    Get a deck's card ids in deck order, without loading any card content
+    (shared between sessions; the tuple is replaced when the deck changes)
+    """
+    return _get_cached(
+        _card_ids_cache, deck_name,
+        lambda name: tuple(card["_id"] for card in get_cards(name, fields=["_id"]))
+    )
+
+def get_distractor_index(deck_name):
+    """Get the deck's multiple-choice distractor index, rebuilt only when the deck changes"""
+    cards = _get_cached_cards(deck_name)
+    entry = _distractor_indexes.get(deck_name)
+    # The cached cards list is replaced (never mutated) when the deck changes
+    if entry is None or entry[0] is not cards:
+        entry = (cards, DistractorIndex(card["answer"] for card in cards))
+        _distractor_indexes[deck_name] = entry
+    return entry[1]
+
+def get_cards(deck_name, skip=0, limit=0, fields=None):
+    """
+    Load cards straight from the database, in deck order
+    Args:
+        deck_name: Name of the deck
+        skip: Number of cards to skip (for paging)
+        limit: Maximum number of cards to return (0 = no limit)
+        fields: Optional list of card fields to return (e.g. ["question", "answer"])
+    Returns:
+        list: Card documents
+    """
     db = get_db()
-    doc = db.decks.find_one({"_id": deck_name})
-    return doc["cards"] if doc else []
+    projection = {field: 1 for field in fields} if fields else CARD_FIELDS
+    cursor = db.cards.find({"deck": deck_name}, projection).sort("position", 1)
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
 
 def add_card_to_deck(deck_name, question, answer, image_data=None):
-    """Add a card to a deck with optional image"""
-    from data.db import get_db
+    """Add a card to a deck with optional image (raw bytes, ingested into the image store)"""
     db = get_db()
     
-    deck = db.decks.find_one({"name": deck_name})
+    # Reserve a position; the version is bumped once the card exists, so no
+    # process can cache the old card list under the new version
+    deck = db.decks.find_one_and_update(
+        {"_id": deck_name},
+        {"$inc": {"next_position": 1}},
+        projection={"next_position": 1},
+        return_document=ReturnDocument.AFTER
+    )
     if not deck:
         return False
     
-    # Get next index
-    next_index = len(deck.get("cards", []))
-    
     # Create card with optional image
     new_card = {
-        "index": next_index,
+        "deck": deck_name,
+        "position": deck["next_position"] - 1,
         "question": question,
         "answer": answer
     }
     
     if image_data:
-        new_card["image"] = image_data
+        new_card.update(ingest_image(image_data))
     
-    db.decks.update_one(
-        {"name": deck_name},
-        {"$push": {"cards": new_card}}
-    )
+    db.cards.insert_one(new_card)
+    if image_data and not card_images_stored(new_card):
+        # The last card sharing this image was deleted (taking the image with
+        # it) before this card referenced it: store it again
+        db.cards.update_one({"_id": new_card["_id"]}, {"$set": ingest_image(image_data)})
+    _bump_version(db, deck_name)
     
     return True
 
@@ -64,10 +271,11 @@ def create_deck(deck_name):
         existing = db.decks.find_one({"_id": deck_name})
         if existing:
             return False
-        # Create new deck with empty cards list
+        # Create new deck (cards are stored in the cards collection)
         db.decks.insert_one({
             "_id": deck_name,
-            "cards": []
+            "version": ObjectId(),
+            "next_position": 0
         })
         return True
     except Exception as e:
@@ -96,10 +304,16 @@ def rename_deck(old_name, new_name):
         # Create new deck with new name
         db.decks.insert_one({
             "_id": new_name,
-            "cards": old_doc["cards"]
+            "version": old_doc.get("version"),
+            "next_position": old_doc.get("next_position", 0)
         })
-        # Delete old deck
+        # Move the cards over, then bump the new deck's version (anything
+        # cached while the cards were moving is reloaded) and delete the old deck
+        db.cards.update_many({"deck": old_name}, {"$set": {"deck": new_name}})
+        db.reviews.update_many({"deck_name": old_name}, {"$set": {"deck_name": new_name}})
+        _bump_version(db, new_name)
         db.decks.delete_one({"_id": old_name})
+        _invalidate_deck_cache(old_name, new_name)
         return True
     except Exception as e:
         print(f"Error renaming deck: {e}")
@@ -115,7 +329,15 @@ def delete_deck(deck_name):
     """
     try:
         db = get_db()
+        image_ids = (
+            db.cards.distinct("image_id", {"deck": deck_name})
+            + db.cards.distinct("thumbnail_id", {"deck": deck_name})
+        )
         result = db.decks.delete_one({"_id": deck_name})
+        db.cards.delete_many({"deck": deck_name})
+        db.reviews.delete_many({"deck_name": deck_name})
+        _invalidate_deck_cache(deck_name)
+        delete_unused_images(image_ids)
         return result.deleted_count > 0
     except Exception as e:
         print(f"Error deleting deck: {e}")
@@ -123,11 +345,7 @@ def delete_deck(deck_name):
 
 def find_duplicate_cards(deck_name):
     """Find duplicate cards in a deck (same question)"""
-    db = get_db()
-    doc = db.decks.find_one({"_id": deck_name})
-    if not doc or "cards" not in doc:
-        return []
-    cards = doc["cards"]
+    cards = _get_cached_cards(deck_name)
     seen = {}
     duplicates = []
     for idx, card in enumerate(cards):
@@ -135,6 +353,7 @@ def find_duplicate_cards(deck_name):
         if question in seen:
             duplicates.append({
                 "index": idx,
+                "card_id": card["_id"],
                 "question": card["question"],
                 "answer": card["answer"],
                 "original_index": seen[question]
@@ -143,28 +362,24 @@ def find_duplicate_cards(deck_name):
             seen[question] = idx
     return duplicates
 
-def delete_card(deck_name, card_index):
-    """Delete a card from a deck by index"""
+def delete_card(deck_name, card_id):
+    """Delete a card from a deck by its _id"""
     db = get_db()
-    doc = db.decks.find_one({"_id": deck_name})
-    if not doc or "cards" not in doc:
+    card = db.cards.find_one_and_delete(
+        {"_id": card_id, "deck": deck_name}, projection={"image_id": 1, "thumbnail_id": 1}
+    )
+    if card is None:
         return False
-    cards = doc["cards"]
-    if 0 <= card_index < len(cards):
-        cards.pop(card_index)
-        db.decks.update_one(
-            {"_id": deck_name},
-            {"$set": {"cards": cards}}
-        )
-        return True
-    return False
+    _bump_version(db, deck_name)
+    delete_unused_images([card.get("image_id"), card.get("thumbnail_id")])
+    return True
 
-def edit_card(deck_name, card_index, new_question, new_answer):
+def edit_card(deck_name, card_id, new_question, new_answer):
     """
     Edit a card in a deck
     Args:
         deck_name: Name of the deck
-        card_index: Index of the card to edit
+        card_id: _id of the card to edit
         new_question: Updated question text
         new_answer: Updated answer text
     Returns:
@@ -172,37 +387,49 @@ def edit_card(deck_name, card_index, new_question, new_answer):
     """
     try:
         db = get_db()
-        doc = db.decks.find_one({"_id": deck_name})
-        if not doc or "cards" not in doc:
+        result = db.cards.update_one(
+            {"_id": card_id, "deck": deck_name},
+            {"$set": {"question": new_question, "answer": new_answer}}
+        )
+        if result.matched_count == 0:
             return False
-        cards = doc["cards"]
-        if 0 <= card_index < len(cards):
-            cards[card_index] = {
-                "question": new_question,
-                "answer": new_answer
-            }
-            db.decks.update_one(
-                {"_id": deck_name},
-                {"$set": {"cards": cards}}
-            )
-            return True
-        return False
+        _bump_version(db, deck_name)
+        return True
     except Exception as e:
         print(f"Error editing card: {e}")
         return False
 
 def get_all_cards_with_indices(deck_name):
     """Get all cards with their indices for management"""
-    db = get_db()
-    doc = db.decks.find_one({"_id": deck_name})
-    if not doc or "cards" not in doc:
-        return []
     return [
         {
             "index": idx,
+            "card_id": card["_id"],
             "question": card["question"],
-            "answer": card["answer"]
+            "answer": card["answer"],
+            "thumbnail_id": card.get("thumbnail_id")
         }
-        for idx, card in enumerate(doc["cards"])
+        for idx, card in enumerate(_get_cached_cards(deck_name))
     ]
-    
\ No newline at end of file
+
+def get_image_savings(deck_name):
+    """
+    Total image bytes as uploaded vs. as stored for a deck
+    Returns:
+        dict: {"images": int, "original_bytes": int, "stored_bytes": int}
+    """
+    db = get_db()
+    result = next(db.cards.aggregate([
+        {"$match": {"deck": deck_name, "image_id": {"$exists": True}}},
+        {"$group": {
+            "_id": None,
+            "images": {"$sum": 1},
+            "original_bytes": {"$sum": {"$ifNull": ["$image_bytes_original", 0]}},
+            "stored_bytes": {"$sum": {"$ifNull": ["$image_bytes_stored", 0]}}
+        }}
+    ]), None)
+    if not result:
+        return {"images": 0, "original_bytes": 0, "stored_bytes": 0}
+    result.pop("_id")
+    return result
+    
@@ -0,0 +1,338 @@
+# data/image_store.py
+"""Content-addressed storage for card images"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from data.db import get_db
+
+
+# Images are stored once, keyed by the SHA-256 of their bytes, either in a
+# GridFS bucket (default) or in a local directory:
+#   [images]
+#   backend = "local"
+#   directory = "static/images"
+# A local directory under the app's static/ directory is served by Streamlit
+# itself at /app/static (server.enableStaticServing in .streamlit/config.toml):
+# each image keeps one URL and is sent with Last-Modified and ETag, so
+# browsers can reuse it from their HTTP cache (heuristic freshness; Streamlit
+# sends no max-age). Images anywhere else go through Streamlit's media
+# endpoint, under per-session URLs with no cache headers.
+GRIDFS_BUCKET = "images"
+DEFAULT_DIRECTORY = "image_store"
+STATIC_DIRECTORY = "static"
+
+# Static files are served with the content type of their extension
+_EXTENSIONS = {
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+}
+
+# Ingestion limits: images are scaled down to fit MAX_DIMENSION and
+# re-encoded; thumbnails fit THUMBNAIL_SIZE (used by the manage tab)
+MAX_DIMENSION = 1600
+THUMBNAIL_SIZE = (160, 160)
+WEBP_QUALITY = 85
+
+# Image bytes are immutable for a given id, so they can be cached forever
+# in-process; the cache is only bounded by size.
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_backend = None
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+
+
+def detect_content_type(data):
+    """Guess an image's MIME type from its leading bytes"""
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class _GridFSBackend:
+    def __init__(self, db):
+        import gridfs
+        self._files = db[f"{GRIDFS_BUCKET}.files"]
+        self._bucket = gridfs.GridFSBucket(db, bucket_name=GRIDFS_BUCKET)
+
+    def exists(self, image_id):
+        return self._files.find_one({"_id": image_id}, {"_id": 1}) is not None
+
+    def put(self, image_id, data, content_type):
+        try:
+            self._bucket.upload_from_stream_with_id(
+                image_id, image_id, data, metadata={"content_type": content_type}
+            )
+        except Exception:
+            # Another process stored the same content first
+            if not self.exists(image_id):
+                raise
+
+    def get(self, image_id):
+        try:
+            return self._bucket.open_download_stream(image_id).read()
+        except Exception:
+            return None
+
+    def url(self, image_id):
+        return None
+
+    def delete(self, image_id):
+        try:
+            self._bucket.delete(image_id)
+        except Exception:
+            # Already gone
+            pass
+
+
+class _LocalBackend:
+    def __init__(self, directory):
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Path under /app/static, if the directory is inside static/
+        static = os.path.relpath(os.path.abspath(directory), os.path.abspath(STATIC_DIRECTORY))
+        self._static_path = None if static.startswith(os.pardir) else static.replace(os.sep, "/")
+
+    def _path(self, image_id):
+        """The image's file (named with its type's extension; older files have none)"""
+        for extension in (*_EXTENSIONS.values(), ""):
+            path = os.path.join(self._directory, image_id + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def exists(self, image_id):
+        return self._path(image_id) is not None
+
+    def put(self, image_id, data, content_type):
+        path = os.path.join(self._directory, image_id + _EXTENSIONS.get(content_type, ""))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, image_id):
+        path = self._path(image_id)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def delete(self, image_id):
+        path = self._path(image_id)
+        if path is not None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def url(self, image_id):
+        if self._static_path is None or not st.get_option("server.enableStaticServing"):
+            return None
+        path = self._path(image_id)
+        if path is None:
+            return None
+        return f"/app/static/{self._static_path}/{os.path.basename(path)}"
+
+
+def _get_backend():
+    global _backend
+
+    if _backend is None:
+        settings = st.secrets.get("images", {})
+        if settings.get("backend", "gridfs") == "local":
+            _backend = _LocalBackend(settings.get("directory", DEFAULT_DIRECTORY))
+        else:
+            _backend = _GridFSBackend(get_db())
+
+    return _backend
+
+
+def _cache_put(image_id, data):
+    global _cache_bytes
+
+    with _cache_lock:
+        if image_id in _cache or len(data) > CACHE_MAX_BYTES:
+            return
+        _cache[image_id] = data
+        _cache_bytes += len(data)
+        while _cache_bytes > CACHE_MAX_BYTES:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted)
+
+
+def put_image(data):
+    """
+    Store image bytes once and return their content id
+    Args:
+        data: Raw image bytes
+    Returns:
+        str: SHA-256 hex digest identifying the image
+    """
+    image_id = hashlib.sha256(data).hexdigest()
+    backend = _get_backend()
+    if not backend.exists(image_id):
+        backend.put(image_id, data, detect_content_type(data))
+    _cache_put(image_id, data)
+    return image_id
+
+
+def get_image(image_id):
+    """Get image bytes by content id (fetched from storage at most once per process)"""
+    with _cache_lock:
+        data = _cache.get(image_id)
+        if data is not None:
+            _cache.move_to_end(image_id)
+            return data
+
+    data = _get_backend().get(image_id)
+    if data is not None:
+        _cache_put(image_id, data)
+    return data
+
+
+def card_images_stored(card):
+    """Whether the images a card references are all in storage"""
+    backend = _get_backend()
+    return all(backend.exists(card[field]) for field in ("image_id", "thumbnail_id") if card.get(field))
+
+
+def delete_unused_images(image_ids):
+    """
+    Delete stored images that no card uses any more (after cards were deleted)
+    Args:
+        image_ids: Ids of images (or thumbnails) the deleted cards had
+    """
+    global _cache_bytes
+
+    cards = get_db().cards
+    backend = _get_backend()
+    for image_id in set(filter(None, image_ids)):
+        # Identical images are stored once, so other cards may share it
+        if cards.find_one({"$or": [{"image_id": image_id}, {"thumbnail_id": image_id}]}, {"_id": 1}):
+            continue
+        try:
+            backend.delete(image_id)
+        except Exception as e:
+            print(f"Error deleting image {image_id}: {e}")
+            continue
+        with _cache_lock:
+            data = _cache.pop(image_id, None)
+            if data is not None:
+                _cache_bytes -= len(data)
+
+
+def image_url(image_id):
+    """URL the image is served at with cache headers (local static storage only), else None"""
+    return _get_backend().url(image_id)
+
+
+def card_image(card):
+    """A card's image for st.image: its static URL when there is one, else its bytes (or None)"""
+    if card.get("image_id"):
+        url = image_url(card["image_id"])
+        if url:
+            return url
+    return load_card_image(card)
+
+
+def load_card_image(card):
+    """Get a card's image bytes, if it has one"""
+    if card.get("image_id"):
+        return get_image(card["image_id"])
+    if card.get("image"):
+        # Cards not yet migrated still carry inline base64
+        return base64.b64decode(card["image"])
+    return None
+
+
+def _encode(image, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, **params)
+    return buffer.getvalue()
+
+
+def _process_image(data):
+    """
+    Cap dimensions and re-encode an upload, and render its thumbnail.
+    Returns: (stored_bytes, thumbnail_bytes or None)
+    """
+    try:
+        from PIL import Image, ImageSequence
+    except ImportError:
+        # Pillow is optional; without it images are stored as uploaded
+        return data, None
+    
+    try:
+        image = Image.open(io.BytesIO(data))
+        too_big = max(image.size) > MAX_DIMENSION
+        
+        if getattr(image, "is_animated", False):
+            # Keep animated GIFs as GIFs; only rescale the frames if needed
+            stored = data
+            if too_big:
+                frames = []
+                for frame in ImageSequence.Iterator(image):
+                    frame = frame.convert("RGBA")
+                    frame.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+                    frames.append(frame)
+                stored = _encode(
+                    frames[0], format="GIF", save_all=True, append_images=frames[1:],
+                    loop=image.info.get("loop", 0), duration=image.info.get("duration", 100),
+                    disposal=2
+                )
+            image.seek(0)
+        else:
+            has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+            still = image.convert("RGBA" if has_alpha else "RGB")
+            if too_big:
+                still.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+            stored = _encode(still, format="WEBP", quality=WEBP_QUALITY, method=6)
+            # Re-encoding an already small, well-compressed file can grow it
+            if not too_big and len(stored) >= len(data):
+                stored = data
+        
+        thumbnail = image.convert("RGBA")
+        thumbnail.thumbnail(THUMBNAIL_SIZE)
+        return stored, _encode(thumbnail, format="WEBP", quality=WEBP_QUALITY)
+    except Exception as e:
+        print(f"Error processing image: {e}")
+        return data, None
+
+
+def ingest_image(data):
+    """
+    Resize, recompress and store an uploaded image along with its thumbnail
+    Args:
+        data: Raw image bytes as uploaded
+    Returns:
+        dict: Card fields referencing the stored image and recording its size
+    """
+    stored, thumbnail = _process_image(data)
+    fields = {
+        "image_id": put_image(stored),
+        "image_bytes_original": len(data),
+        "image_bytes_stored": len(stored)
+    }
+    if thumbnail:
+        fields["thumbnail_id"] = put_image(thumbnail)
+    return fields
@@ -0,0 +1,195 @@
+# data/leaderboard.py
+import threading
+import time
+
+from data.db import get_db
+
+# The top LEADERBOARD_SIZE unflagged users are cached per process and shared
+# by every session. Score changes made through update_user_score are applied
+# to the cached board as they happen; the board is reloaded from MongoDB at
+# most once per LEADERBOARD_TTL_SECONDS to pick up other processes' writes.
+# Sessions that read an expired board while another thread is reloading it
+# get the previous board instead of waiting.
+LEADERBOARD_SIZE = 100
+LEADERBOARD_TTL_SECONDS = 30
+
+# Only what the leaderboard table shows (never the password hash)
+LEADERBOARD_FIELDS = {
+    "total_score": 1,
+    "cards_studied": 1,
+    "correct_answers": 1,
+    "current_streak": 1,
+    "best_streak": 1,
+    "verification_passed": 1,
+    "verification_failed": 1
+}
+
+_board = None
+# True when the last reload returned every unflagged user
+_board_has_everyone = False
+_refreshed_at = 0.0
+_board_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+# Rank of scores outside the cached board: score -> (users above it, counted_at)
+_rank_counts = {}
+# Number of unflagged users: (count, counted_at)
+_ranked_count = None
+
+
+def _score(user):
+    return user.get("total_score", 0)
+
+
+def _refresh():
+    global _board, _board_has_everyone, _refreshed_at, _ranked_count
+
+    db = get_db()
+    board = list(
+        db.users.find({"flagged": {"$ne": True}}, LEADERBOARD_FIELDS)
+        .sort("total_score", -1)
+        .limit(LEADERBOARD_SIZE)
+    )
+    with _board_lock:
+        _board = board
+        _board_has_everyone = len(board) < LEADERBOARD_SIZE
+        _refreshed_at = time.time()
+        _rank_counts.clear()
+        _ranked_count = None
+
+
+def _current_board():
+    """The cached board, reloading it first if it has expired"""
+    if _board is not None and time.time() - _refreshed_at < LEADERBOARD_TTL_SECONDS:
+        return _board
+
+    # Only one thread reloads; the others keep using the old board if there is one
+    if _refresh_lock.acquire(blocking=_board is None):
+        try:
+            if _board is None or time.time() - _refreshed_at >= LEADERBOARD_TTL_SECONDS:
+                _refresh()
+        except Exception as e:
+            print(f"Error loading leaderboard: {e}")
+        finally:
+            _refresh_lock.release()
+
+    return _board or []
+
+
+def get_top_users(limit=10):
+    """Get top users by score, excluding flagged users"""
+    if limit > LEADERBOARD_SIZE:
+        db = get_db()
+        return list(
+            db.users.find({"flagged": {"$ne": True}}, LEADERBOARD_FIELDS)
+            .sort("total_score", -1)
+            .limit(limit)
+        )
+    return _current_board()[:limit]
+
+
+def get_leaderboard_page(skip, limit):
+    """
+    A page of the leaderboard: from the cached board while it covers the page,
+    from MongoDB (skip/limit on the total_score index) past it
+    """
+    if skip + limit <= LEADERBOARD_SIZE:
+        return _current_board()[skip:skip + limit]
+    db = get_db()
+    return list(
+        db.users.find({"flagged": {"$ne": True}}, LEADERBOARD_FIELDS)
+        .sort("total_score", -1)
+        .skip(skip)
+        .limit(limit)
+    )
+
+
+def count_ranked_users():
+    """Number of users on the leaderboard (unflagged), counted at most once per TTL"""
+    global _ranked_count
+
+    board = _current_board()
+    if _board_has_everyone:
+        return len(board)
+
+    now = time.time()
+    cached = _ranked_count
+    if cached and now - cached[1] < LEADERBOARD_TTL_SECONDS:
+        return cached[0]
+
+    db = get_db()
+    count = db.users.count_documents({"flagged": {"$ne": True}})
+    _ranked_count = (count, now)
+    return count
+
+
+def get_user_rank(user):
+    """
+    Get a user's 1-based position on the leaderboard
+    Args:
+        user: The user's document (only _id, total_score and flagged are used)
+    Returns:
+        int, or None for flagged users
+    """
+    if not user or user.get("flagged"):
+        return None
+
+    board = _current_board()
+    for position, entry in enumerate(board, 1):
+        if entry["_id"] == user["_id"]:
+            return position
+
+    # Not in the top: count the users above this score (an index range count
+    # on total_score, remembered per score until the board is next reloaded)
+    score = _score(user)
+    now = time.time()
+    cached = _rank_counts.get(score)
+    if cached and now - cached[1] < LEADERBOARD_TTL_SECONDS:
+        return cached[0] + 1
+
+    db = get_db()
+    above = db.users.count_documents({"flagged": {"$ne": True}, "total_score": {"$gt": score}})
+    _rank_counts[score] = (above, now)
+    return above + 1
+
+
+def record_score(user):
+    """
+    Apply a user's new score to the cached board
+    Args:
+        user: The user's updated document, as returned by update_user_score
+    """
+    global _board, _refreshed_at
+
+    if not user:
+        return
+
+    with _board_lock:
+        if _board is None:
+            return
+
+        others = [entry for entry in _board if entry["_id"] != user["_id"]]
+        was_listed = len(others) != len(_board)
+        entry = {"_id": user["_id"], **{field: user.get(field, 0) for field in LEADERBOARD_FIELDS}}
+
+        if user.get("flagged"):
+            board = others
+        elif _board_has_everyone or others and _score(entry) >= _score(others[-1]):
+            board = sorted(others + [entry], key=_score, reverse=True)[:LEADERBOARD_SIZE]
+        else:
+            board = others
+
+        # A listed user who fell out leaves a gap only a reload can fill
+        if was_listed and len(board) < len(_board) and not _board_has_everyone:
+            _refreshed_at = 0.0
+        _board = board
+
+
+def invalidate_leaderboard():
+    """Reload the board on next use (after flags, resets and bulk score changes)"""
+    global _refreshed_at, _ranked_count
+
+    with _board_lock:
+        _refreshed_at = 0.0
+        _rank_counts.clear()
+        _ranked_count = None
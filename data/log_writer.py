@@ -0,0 +1,200 @@
+# data/log_writer.py
+"""Background, batched writer for study session events"""
+import atexit
+import queue
+import threading
+import time
+
+from pymongo.errors import BulkWriteError
+
+from data.analytics import ANALYTICS_COLLECTION, apply_analytics
+from data.anticheat import DETECTOR_COLLECTION, apply_detector
+from data.db import get_db
+from data.rollups import HOURLY_ROLLUP_COLLECTION, ROLLUP_COLLECTION, apply_rollups
+from data.session_store import SESSION_BUCKETS, write_sessions
+
+
+# Defaults for the process-wide writer
+BATCH_SIZE = 200
+FLUSH_INTERVAL_SECONDS = 2.0
+MAX_QUEUE_SIZE = 20000
+# What to do when the queue is full: "drop_oldest", "drop_newest" or "block"
+OVERFLOW_POLICY = "drop_oldest"
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class BufferedLogWriter:
+    """
+    Queue documents in memory and write them from a background thread.
+    A batch is written with insert_many(ordered=False) once it reaches
+    batch_size documents or flush_interval seconds have passed; write, if
+    given, replaces insert_many: write(collection, batch) returns the documents
+    it wrote. after_write, if given, is called with the documents of each
+    batch that were written.
+    """
+
+    def __init__(self, collection, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL_SECONDS, max_queue_size=MAX_QUEUE_SIZE,
+                 overflow_policy=OVERFLOW_POLICY, write=None, after_write=None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.write = write
+        self.after_write = after_write
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the background flush thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="study-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, doc):
+        """Queue a document for writing; never waits unless the policy is 'block'"""
+        if self.overflow_policy == "block":
+            self._queue.put(doc)
+            return
+
+        while True:
+            try:
+                self._queue.put_nowait(doc)
+                return
+            except queue.Full:
+                self.dropped += 1
+                if self.overflow_policy == "drop_newest":
+                    return
+                # drop_oldest: make room and try again
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def flush(self):
+        """Write everything currently queued from the calling thread"""
+        batch = self._drain(limit=None)
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+    def close(self, timeout=10):
+        """Stop the background thread and write whatever is still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """Counters for monitoring the writer"""
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+    def _drain(self, limit):
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while not self._stop.is_set():
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                batch.extend(self._drain(limit=self.batch_size - len(batch)))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        with self._write_lock:
+            try:
+                if self.write is not None:
+                    written = self.write(self.collection, batch)
+                    self.failed += len(batch) - len(written)
+                    batch = written
+                else:
+                    self.collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+            except BulkWriteError as e:
+                inserted = e.details.get("nInserted", 0)
+                self.written += inserted
+                self.failed += len(batch) - inserted
+                print(f"Error writing {self.collection.name} batch: {e}")
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                batch = [doc for index, doc in enumerate(batch) if index not in failed]
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Error writing {self.collection.name} batch: {e}")
+                return
+
+            if self.after_write is not None and batch:
+                try:
+                    self.after_write(batch)
+                except Exception as e:
+                    print(f"Error after writing {self.collection.name} batch: {e}")
+
+
+def get_log_writer():
+    """Get the process-wide study session writer, starting it on first use"""
+    global _writer
+
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                # Resolve the collection on the calling (script) thread so the
+                # background thread never has to open a connection itself
+                db = get_db()
+                rollups = db[ROLLUP_COLLECTION]
+                hourly_rollups = db[HOURLY_ROLLUP_COLLECTION]
+                detector = db[DETECTOR_COLLECTION]
+                analytics = db[ANALYTICS_COLLECTION]
+                
+                def after_write(batch):
+                    apply_rollups(rollups, batch)
+                    apply_rollups(hourly_rollups, batch, unit="hour")
+                    apply_detector(detector, batch)
+                    apply_analytics(analytics, batch)
+                
+                writer = BufferedLogWriter(
+                    db[SESSION_BUCKETS], write=write_sessions, after_write=after_write
+                )
+                writer.start()
+                atexit.register(writer.close)
+                _writer = writer
+
+    return _writer
@@ -0,0 +1,40 @@
+# data/review_store.py
+from datetime import datetime
+
+from data.db import get_db
+
+# Spaced repetition state, one document per user and card:
+#   {"_id": ObjectId, "username": str, "deck_name": str, "card_id": card _id,
+#    "ease": float, "interval": int (days), "reps": int, "lapses": int,
+#    "due_at": datetime, "last_review": datetime}
+REVIEW_FIELDS = {"_id": 0, "card_id": 1, "ease": 1, "interval": 1, "reps": 1, "lapses": 1, "due_at": 1}
+
+
+def load_review_states(username, deck_name):
+    """
+    Get a user's review state for every card of a deck they have studied
+    Returns:
+        dict: card _id -> state (ease, interval, reps, lapses, due_at)
+    """
+    db = get_db()
+    try:
+        return {
+            doc.pop("card_id"): doc
+            for doc in db.reviews.find({"username": username, "deck_name": deck_name}, REVIEW_FIELDS)
+        }
+    except Exception as e:
+        print(f"Error loading review states: {e}")
+        return {}
+
+
+def save_review_state(username, deck_name, card_id, state):
+    """Store one card's review state after it was answered"""
+    db = get_db()
+    try:
+        db.reviews.update_one(
+            {"username": username, "deck_name": deck_name, "card_id": card_id},
+            {"$set": {**state, "last_review": datetime.utcnow()}},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Error saving review state: {e}")
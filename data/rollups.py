@@ -0,0 +1,222 @@
+# data/rollups.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from data.db import RAW_SESSION_RETENTION_DAYS, get_db
+from data.session_store import SESSION_BUCKETS
+
+# Per-user, per-deck totals, kept up to date as study sessions are written
+# (see data.log_writer), by day and by hour:
+#   {"_id": ObjectId, "username": str, "deck_name": str, "day" / "hour": datetime (UTC),
+#    "points": int, "answers": int, "correct": int, "response_time": float (seconds, summed)}
+# Weekly and per-deck leaderboards read these instead of raw study sessions,
+# which expire (data.session_store). Daily rollups are kept for good; hourly
+# ones expire after HOURLY_ROLLUP_RETENTION_DAYS.
+ROLLUP_COLLECTION = "score_rollups"
+HOURLY_ROLLUP_COLLECTION = "score_rollups_hourly"
+
+# Leaderboard windows: name -> number of days including today (None = all time)
+WINDOWS = {
+    "all": None,
+    "week": 7,
+    "today": 1,
+}
+
+# Rollup leaderboards are shared between sessions for this long
+ROLLUP_CACHE_SECONDS = 60
+
+# (deck_name, window, skip, limit) -> (rows, total, cached_at)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _day(timestamp):
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def _hour(timestamp):
+    return datetime(timestamp.year, timestamp.month, timestamp.day, timestamp.hour)
+
+
+_TRUNCATE = {"day": _day, "hour": _hour}
+
+
+def rollup_updates(sessions, unit="day"):
+    """
+    Fold study session documents into rollup upserts
+    Args:
+        sessions: study session documents (with "points" when known)
+        unit: "day" or "hour"
+    Returns:
+        list of UpdateOne operations for the rollup collection
+    """
+    truncate = _TRUNCATE[unit]
+    totals = {}
+    for session in sessions:
+        key = (session["username"], session["deck_name"], truncate(session["timestamp"]))
+        total = totals.setdefault(key, {"points": 0, "answers": 0, "correct": 0, "response_time": 0})
+        total["points"] += session.get("points", 0)
+        total["answers"] += 1
+        total["correct"] += int(bool(session.get("correct")))
+        total["response_time"] += session.get("response_time") or 0
+
+    return [
+        UpdateOne(
+            {"username": username, "deck_name": deck_name, unit: start},
+            {"$inc": total},
+            upsert=True
+        )
+        for (username, deck_name, start), total in totals.items()
+    ]
+
+
+def apply_rollups(collection, sessions, unit="day"):
+    """
+    Add a batch of written study sessions to the rollups (one bulk write)
+    Returns:
+        bool: False if the write failed
+    """
+    updates = rollup_updates(sessions, unit)
+    if not updates:
+        return True
+    try:
+        collection.bulk_write(updates, ordered=False)
+    except Exception as e:
+        print(f"Error updating {collection.name}: {e}")
+        return False
+    return True
+
+
+def apply_regrades(db, regraded):
+    """
+    Move regraded answers' points and correct counts in the daily and hourly
+    rollups (answer counts don't change)
+    Args:
+        regraded: study sessions with their new "correct" and the change in
+            "points" the regrade made
+    """
+    for collection, unit in ((ROLLUP_COLLECTION, "day"), (HOURLY_ROLLUP_COLLECTION, "hour")):
+        truncate = _TRUNCATE[unit]
+        totals = {}
+        for session in regraded:
+            key = (session["username"], session["deck_name"], truncate(session["timestamp"]))
+            total = totals.setdefault(key, {"points": 0, "correct": 0})
+            total["points"] += session["points"]
+            total["correct"] += 1 if session["correct"] else -1
+        if not totals:
+            continue
+        try:
+            db[collection].bulk_write([
+                UpdateOne({"username": username, "deck_name": deck_name, unit: start}, {"$inc": total})
+                for (username, deck_name, start), total in totals.items()
+            ], ordered=False)
+        except Exception as e:
+            print(f"Error updating {collection}: {e}")
+    invalidate_rollup_cache()
+
+
+def rebuild_rollups():
+    """
+    Recompute the daily and hourly rollups of the days still covered by raw
+    session buckets. Older rollups are all that is left of their sessions
+    and are kept as they are.
+    """
+    db = get_db()
+    # The oldest day whose buckets can't have expired yet
+    cutoff = _day(datetime.utcnow()) - timedelta(days=RAW_SESSION_RETENTION_DAYS - 1)
+
+    for collection, unit, on in (
+        (ROLLUP_COLLECTION, "day", ["deck_name", "day", "username"]),
+        (HOURLY_ROLLUP_COLLECTION, "hour", ["username", "hour", "deck_name"]),
+    ):
+        db[collection].delete_many({unit: {"$gte": cutoff}})
+        db[SESSION_BUCKETS].aggregate([
+            {"$match": {"start": {"$gte": cutoff}}},
+            {"$unwind": "$events"},
+            {"$group": {
+                "_id": {
+                    "username": "$username",
+                    "deck_name": "$deck_name",
+                    unit: {"$dateTrunc": {"date": "$events.t", "unit": unit}}
+                },
+                "points": {"$sum": {"$ifNull": ["$events.p", 0]}},
+                "answers": {"$sum": 1},
+                "correct": {"$sum": {"$cond": ["$events.ok", 1, 0]}},
+                "response_time": {"$sum": {"$ifNull": ["$events.rt", 0]}}
+            }},
+            {"$project": {
+                "_id": 0,
+                "username": "$_id.username",
+                "deck_name": "$_id.deck_name",
+                unit: f"$_id.{unit}",
+                "points": 1,
+                "answers": 1,
+                "correct": 1,
+                "response_time": 1
+            }},
+            {"$merge": {"into": collection, "on": on}}
+        ])
+    invalidate_rollup_cache()
+
+
+def get_rollup_leaderboard(deck_name=None, window="week", skip=0, limit=10):
+    """
+    Rank users by points earned in a deck and/or time window
+    Args:
+        deck_name: Only count this deck (None for all decks)
+        window: A key of WINDOWS
+        skip, limit: The page of results to return
+    Returns:
+        (rows, total): rows shaped like user documents ("_id", "total_score",
+        "cards_studied", "correct_answers"), and the number of ranked users
+    """
+    key = (deck_name, window, skip, limit)
+    now = time.time()
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached and now - cached[2] < ROLLUP_CACHE_SECONDS:
+        return cached[0], cached[1]
+
+    db = get_db()
+    match = {}
+    if deck_name:
+        match["deck_name"] = deck_name
+    if WINDOWS[window]:
+        match["day"] = {"$gte": _day(datetime.utcnow()) - timedelta(days=WINDOWS[window] - 1)}
+    flagged = [user["_id"] for user in db.users.find({"flagged": True}, {"_id": 1})]
+    if flagged:
+        match["username"] = {"$nin": flagged}
+
+    try:
+        result = next(db[ROLLUP_COLLECTION].aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": "$username",
+                "total_score": {"$sum": "$points"},
+                "cards_studied": {"$sum": "$answers"},
+                "correct_answers": {"$sum": "$correct"}
+            }},
+            {"$sort": {"total_score": -1, "_id": 1}},
+            {"$facet": {
+                "rows": [{"$skip": skip}, {"$limit": limit}],
+                "total": [{"$count": "count"}]
+            }}
+        ]))
+    except Exception as e:
+        print(f"Error loading rollup leaderboard: {e}")
+        return [], 0
+
+    rows = result["rows"]
+    total = result["total"][0]["count"] if result["total"] else 0
+    with _cache_lock:
+        _cache[key] = (rows, total, now)
+    return rows, total
+
+
+def invalidate_rollup_cache():
+    """Forget cached rollup leaderboards"""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,244 @@
+# data/session_store.py
+import secrets
+import time
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from data.db import HOURLY_ROLLUP_RETENTION_DAYS, RAW_SESSION_RETENTION_DAYS, get_db
+
+# Raw study sessions (one per answer) are stored in buckets: one document per
+# user, deck and hour, holding that hour's answers in compact form:
+#   {"_id": ObjectId, "username": str, "deck_name": str, "start": datetime (hour),
+#    "count": int, "events": [{"t": datetime, "c": card _id, "rt": float,
+#    "ok": bool, "m": str, "p": int, "v": bool, "a": str (typed answers only)}]}
+# The user and deck are stored once per bucket instead of once per answer, and
+# a card is referenced by id instead of by its question text. A TTL index on
+# start drops buckets RAW_SESSION_RETENTION_DAYS after their hour; by then
+# every answer has long been added to the hourly and daily rollups
+# (data.rollups), which is what leaderboards and stats read.
+SESSION_BUCKETS = "session_buckets"
+
+# Session field -> event field
+EVENT_FIELDS = {
+    "timestamp": "t",
+    "card_id": "c",
+    "response_time": "rt",
+    "correct": "ok",
+    "mode": "m",
+    "points": "p",
+    "verified": "v",
+    "user_answer": "a",
+}
+SESSION_FIELDS = {event: field for field, event in EVENT_FIELDS.items()}
+
+# Legacy one-document-per-answer collection (migrated by migrate_legacy_sessions)
+LEGACY_COLLECTION = "study_sessions"
+MIGRATION_BATCH_SIZE = 1000
+# Only one process migrates at a time, holding a lock document in this
+# collection; a lock not refreshed for this long is taken over
+MIGRATION_LOCKS = "migrations"
+MIGRATION_LOCK_TIMEOUT = timedelta(minutes=10)
+# A process that finds the lock taken doesn't ask again for this long
+MIGRATION_RETRY_SECONDS = 60
+
+_sessions_migrated = False
+_migration_retry_at = 0.0
+
+
+def _hour(timestamp):
+    return datetime(timestamp.year, timestamp.month, timestamp.day, timestamp.hour)
+
+
+def _bucket_key(session):
+    return session["username"], session["deck_name"], _hour(session["timestamp"])
+
+
+def to_event(session):
+    """Compact a study session into a bucket event"""
+    return {event: session[field] for field, event in EVENT_FIELDS.items() if field in session}
+
+
+def bucket_updates(sessions):
+    """
+    Group study sessions into bucket upserts
+    Returns:
+        (keys, updates): the (username, deck_name, hour) of each update, and
+        the UpdateOne operations themselves
+    """
+    events = {}
+    for session in sessions:
+        events.setdefault(_bucket_key(session), []).append(to_event(session))
+
+    keys = list(events)
+    updates = [
+        UpdateOne(
+            {"username": username, "deck_name": deck_name, "start": start},
+            {"$push": {"events": {"$each": events[(username, deck_name, start)]}},
+             "$inc": {"count": len(events[(username, deck_name, start)])}},
+            upsert=True
+        )
+        for username, deck_name, start in keys
+    ]
+    return keys, updates
+
+
+def write_sessions(collection, sessions):
+    """
+    Add a batch of study sessions to their buckets (one bulk write)
+    Returns:
+        list: the sessions that were written
+    """
+    keys, updates = bucket_updates(sessions)
+    if not updates:
+        return []
+    try:
+        collection.bulk_write(updates, ordered=False)
+    except BulkWriteError as e:
+        print(f"Error writing {collection.name} batch: {e}")
+        failed = {keys[error["index"]] for error in e.details.get("writeErrors", [])}
+        return [session for session in sessions if _bucket_key(session) not in failed]
+    return sessions
+
+
+def sessions_from_bucket(bucket):
+    """
+    Expand a bucket back into study session dicts. Each also carries the
+    bucket's _id and the event's index in it ("_bucket", "_event").
+    """
+    for index, event in enumerate(bucket.get("events", [])):
+        session = {SESSION_FIELDS[key]: value for key, value in event.items() if key in SESSION_FIELDS}
+        session.update({
+            "username": bucket.get("username"),
+            "deck_name": bucket.get("deck_name"),
+            "_bucket": bucket["_id"],
+            "_event": index
+        })
+        yield session
+
+
+def find_sessions(query, projection=None):
+    """Study sessions of the buckets matching a query on username, deck_name and start"""
+    db = get_db()
+    for bucket in db[SESSION_BUCKETS].find(query, projection):
+        yield from sessions_from_bucket(bucket)
+
+
+def _legacy_session(doc, card_ids):
+    """A legacy study_sessions document as a study session"""
+    from core.scoring import BASE_POINTS, WRONG_PENALTY
+    from data.deck_store import get_deck
+
+    deck_name = doc.get("deck_name")
+    if deck_name not in card_ids:
+        card_ids[deck_name] = {card["question"]: card["_id"] for card in get_deck(deck_name)}
+    session = {field: doc[field] for field in EVENT_FIELDS if field in doc and field != "card_id"}
+    session.update({
+        "username": doc["username"],
+        "deck_name": deck_name,
+        "card_id": card_ids[deck_name].get(doc.get("card_question")),
+        "points": doc.get("points", BASE_POINTS if doc.get("correct") else WRONG_PENALTY)
+    })
+    return session
+
+
+def migrate_legacy_sessions():
+    """
+    Move one-document-per-answer study_sessions into buckets and rollups.
+    Safe to call on every run: it does nothing once a process has migrated,
+    and only the process holding the migration lock works on it.
+    Every answer is added to the daily rollups, answers within the hourly
+    rollup retention to the hourly rollups, and answers within the raw
+    retention to the buckets; questions are replaced by the id of the card
+    that has them now. Each legacy document records the stores it has been
+    added to ("migrated"), so a failed write is retried on a later run
+    without counting the answer twice, and it is deleted once it is in all
+    of them. The emptied collection is left for an admin to drop.
+    """
+    global _sessions_migrated, _migration_retry_at
+
+    if _sessions_migrated or time.time() < _migration_retry_at:
+        return
+
+    from data.rollups import HOURLY_ROLLUP_COLLECTION, ROLLUP_COLLECTION, apply_rollups
+
+    db = get_db()
+    legacy = db[LEGACY_COLLECTION]
+    if not legacy.estimated_document_count():
+        _sessions_migrated = True
+        return
+
+    locks = db[MIGRATION_LOCKS]
+    owner = secrets.token_hex(8)
+    try:
+        locks.find_one_and_update(
+            {"_id": LEGACY_COLLECTION, "locked_at": {"$not": {"$gte": datetime.utcnow() - MIGRATION_LOCK_TIMEOUT}}},
+            {"$set": {"owner": owner, "locked_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another process is migrating; look again after a while
+        _migration_retry_at = time.time() + MIGRATION_RETRY_SECONDS
+        return
+
+    now = datetime.utcnow()
+    cutoffs = {
+        "day": None,
+        "hour": now - timedelta(days=HOURLY_ROLLUP_RETENTION_DAYS),
+        "buckets": now - timedelta(days=RAW_SESSION_RETENTION_DAYS),
+    }
+    writes = {
+        "day": lambda batch: batch if apply_rollups(db[ROLLUP_COLLECTION], batch) else [],
+        "hour": lambda batch: batch if apply_rollups(db[HOURLY_ROLLUP_COLLECTION], batch, unit="hour") else [],
+        "buckets": lambda batch: write_sessions(db[SESSION_BUCKETS], batch),
+    }
+    card_ids = {}
+    complete = True
+    last_id = None
+
+    while True:
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        batch = list(legacy.find(query).sort("_id", 1).limit(MIGRATION_BATCH_SIZE))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        sessions = {doc["_id"]: _legacy_session(doc, card_ids) for doc in batch}
+        done = {doc["_id"]: set(doc.get("migrated", [])) for doc in batch}
+        needed = {
+            _id: {store for store, cutoff in cutoffs.items() if cutoff is None or s["timestamp"] >= cutoff}
+            for _id, s in sessions.items()
+        }
+        for store, write in writes.items():
+            pending = {id(s): _id for _id, s in sessions.items() if store in needed[_id] - done[_id]}
+            if pending:
+                for session in write([sessions[_id] for _id in pending.values()]):
+                    done[pending[id(session)]].add(store)
+
+        finished = [_id for _id in sessions if needed[_id] <= done[_id]]
+        if finished:
+            legacy.delete_many({"_id": {"$in": finished}})
+        progress = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"migrated": sorted(done[doc["_id"]])}})
+            for doc in batch
+            if not needed[doc["_id"]] <= done[doc["_id"]] and done[doc["_id"]] != set(doc.get("migrated", []))
+        ]
+        if progress:
+            legacy.bulk_write(progress, ordered=False)
+        if len(finished) < len(batch):
+            complete = False
+
+        # Keep the lock; stop if another process took it over
+        if not locks.update_one(
+            {"_id": LEGACY_COLLECTION, "owner": owner},
+            {"$set": {"locked_at": datetime.utcnow()}}
+        ).matched_count:
+            _migration_retry_at = time.time() + MIGRATION_RETRY_SECONDS
+            return
+
+    locks.delete_one({"_id": LEGACY_COLLECTION, "owner": owner})
+    if complete:
+        _sessions_migrated = True
+    else:
+        _migration_retry_at = time.time() + MIGRATION_RETRY_SECONDS
@@ -1,7 +1,18 @@
 # data/user_store.py
 
+from core.answer_checking import check_answers_batch, regrade_deltas
+from data.analytics import ANALYTICS_COLLECTION, apply_analytics_regrades, clear_user_analytics
+from data.anticheat import clear_detector_state, get_alerts
 from data.db import get_db
+from data.deck_store import get_deck
+from data.leaderboard import get_top_users, invalidate_leaderboard, record_score
+from data.log_writer import get_log_writer
+from data.rollups import HOURLY_ROLLUP_COLLECTION, ROLLUP_COLLECTION, apply_regrades, invalidate_rollup_cache
+from data.session_store import SESSION_BUCKETS, find_sessions
+from data.write_behind import get_write_behind
 from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from streamlit_auth.passwords import get_password_hasher
 
 
 def get_all_usernames():
@@ -11,11 +22,11 @@ def get_all_usernames():
 
 
 def create_user(username, password, is_admin=False):
-    """Create a new user with password"""
+    """Create a new user with password (stored hashed)"""
     db = get_db()
     db.users.insert_one({
         "_id": username,
-        "password": password,
+        "password": get_password_hasher().hash(password),
         "is_admin": is_admin,
         "total_score": 0,
         "cards_studied": 0,
@@ -37,104 +48,146 @@ def get_user(username):
 
 
 def update_user_score(username, points_delta, correct=True, verified=False):
-    """Update user's score and stats"""
+    """
+    Update user's score and stats in a single atomic round trip.
+    Returns: the updated user document (None if the user doesn't exist)
+    """
     db = get_db()
-    increment = {
-        "total_score": points_delta,
-        "cards_studied": 1
+    
+    def inc(field, amount=1):
+        return {"$add": [{"$ifNull": [f"${field}", 0]}, amount]}
+    
+    updates = {
+        "total_score": inc("total_score", points_delta),
+        "cards_studied": inc("cards_studied"),
+        # Streak grows on a correct answer and resets on a wrong one
+        "current_streak": inc("current_streak") if correct else 0
     }
     
     if correct:
-        increment["correct_answers"] = 1
-        increment["current_streak"] = 1
+        updates["correct_answers"] = inc("correct_answers")
     else:
-        increment["incorrect_answers"] = 1
+        updates["incorrect_answers"] = inc("incorrect_answers")
     
     if verified:
         if correct:
-            increment["verification_passed"] = 1
+            updates["verification_passed"] = inc("verification_passed")
         else:
-            increment["verification_failed"] = 1
-        
-    db.users.update_one(
+            updates["verification_failed"] = inc("verification_failed")
+    
+    # Update pipeline: the second stage sees the streak written by the first,
+    # so best_streak is raised server-side without a read-modify-write race
+    user = db.users.find_one_and_update(
         {"_id": username},
-        {
-            "$inc": increment
-        }
+        [
+            {"$set": updates},
+            {"$set": {"best_streak": {"$max": [{"$ifNull": ["$best_streak", 0]}, "$current_streak"]}}}
+        ],
+        return_document=ReturnDocument.AFTER
     )
-    
-    # Update best streak if current is higher
-    user = get_user(username)
-    if correct and user["current_streak"] > user.get("best_streak", 0):
-        db.users.update_one(
-            {"_id": username},
-            {"$set": {"best_streak": user["current_streak"]}}
-        )
-    
-    # Reset streak if incorrect
-    if not correct:
-        db.users.update_one(
-            {"_id": username},
-            {"$set": {"current_streak": 0}}
-        )
+    record_score(user)
+    return user
 
 
-def log_study_session(username, deck_name, card_question, response_time, correct, mode):
-    """Log individual card responses for anti-cheat analysis"""
-    db = get_db()
-    db.study_sessions.insert_one({
+def submit_score_update(username, points_delta, correct=True, verified=False):
+    """
+    Run update_user_score in the background, after any earlier writes for the user
+    Returns: Future of the updated user document
+    """
+    return get_write_behind().submit(username, update_user_score, username, points_delta, correct, verified)
+
+
+def log_study_session(username, deck_name, card_id, response_time, correct, mode, user_answer=None, points=0, verified=False):
+    """
+    Log individual card responses for anti-cheat analysis (written in the background).
+    points are the score change the answer earned; they feed the per-deck and
+    weekly leaderboards. verified marks answers that were verification checks.
+    """
+    session = {
         "username": username,
         "deck_name": deck_name,
-        "card_question": card_question,
+        "card_id": card_id,
         "response_time": response_time,
         "correct": correct,
         "mode": mode,
+        "points": points,
+        "verified": verified,
         "timestamp": datetime.utcnow()
-    })
+    }
+    # Typed answers are kept so they can be regraded if the answer key changes
+    if user_answer is not None:
+        session["user_answer"] = user_answer
+    get_log_writer().submit(session)
 
 
-def get_suspicious_users():
-    """Get users with suspicious patterns"""
+def apply_score_deltas(deltas):
+    """
+    Apply many users' score changes in one bulk write
+    Args:
+        deltas: username -> {field: amount} to $inc
+    """
+    if not deltas:
+        return
+    db = get_db()
+    db.users.bulk_write(
+        [UpdateOne({"_id": username}, {"$inc": delta}) for username, delta in deltas.items()],
+        ordered=False
+    )
+    invalidate_leaderboard()
+
+
+def regrade_deck_answers(deck_name, threshold=0.8):
+    """
+    Regrade every logged typed answer for a deck against the current answer key
+    Returns: number of answers whose grade changed
+    """
     db = get_db()
-    suspicious = []
+    answer_key = {card["_id"]: card["answer"] for card in get_deck(deck_name)}
     
-    for user in db.users.find():
-        username = user["_id"]
-        
-        # Check 1: ONLY flag if 100% accuracy (literally perfect) with many cards
-        total = user.get("cards_studied", 0)
-        if total >= 100:  # Increased threshold
-            accuracy = (user.get("correct_answers", 0) / total * 100) if total > 0 else 0
-            if accuracy >= 99.5:  # Changed to 99.5% (almost perfect)
-                suspicious.append({
-                    "username": username,
-                    "reason": f"Suspiciously perfect accuracy: {accuracy:.1f}% over {total} cards",
-                    "severity": "medium"
-                })
-        
-        # Check 2: Failed verification checks (this is the real cheater detector)
-        verif_total = user.get("verification_passed", 0) + user.get("verification_failed", 0)
-        if verif_total >= 10:
-            verif_accuracy = (user.get("verification_passed", 0) / verif_total * 100)
-            if verif_accuracy < 50:  # Failing verifications = likely cheating
-                suspicious.append({
-                    "username": username,
-                    "reason": f"Low verification accuracy: {verif_accuracy:.1f}% (likely clicking 'Got it' without knowing)",
-                    "severity": "high"
-                })
+    # Only answers still kept as raw sessions (see data.session_store) can be regraded
+    sessions = [
+        s for s in find_sessions(
+            {"deck_name": deck_name, "events.a": {"$exists": True}},
+            {"username": 1, "deck_name": 1, "events": 1}
+        )
+        if "user_answer" in s and s.get("card_id") in answer_key
+    ]
+    similarities = check_answers_batch(
+        ((s["user_answer"], answer_key[s["card_id"]]) for s in sessions), threshold
+    )
+    changes, deltas = regrade_deltas(sessions, similarities, threshold)
+    
+    if changes:
+        from core.scoring import BASE_POINTS, WRONG_PENALTY
         
-        # Check 3: Impossible speed (average < 1 second = likely auto-clicking)
-        recent_sessions = list(db.study_sessions.find({"username": username}).limit(50))
-        if len(recent_sessions) >= 20:
-            avg_time = sum(s.get("response_time", 0) for s in recent_sessions) / len(recent_sessions)
-            if avg_time < 1:  # Changed to 1 second
-                suspicious.append({
-                    "username": username,
-                    "reason": f"Impossibly fast responses: {avg_time:.1f}s average",
-                    "severity": "high"
-                })
+        # One update per bucket, regrading each event by its index; the same
+        # point changes go to the users, the rollups and the analytics
+        updates = {}
+        regraded = []
+        for i, correct in changes:
+            session = sessions[i]
+            points = (BASE_POINTS - WRONG_PENALTY) * (1 if correct else -1)
+            update = updates.setdefault(session["_bucket"], {"$set": {}, "$inc": {}})
+            update["$set"][f"events.{session['_event']}.ok"] = correct
+            update["$inc"][f"events.{session['_event']}.p"] = points
+            regraded.append({**session, "correct": correct, "points": points})
+        db[SESSION_BUCKETS].bulk_write(
+            [UpdateOne({"_id": bucket}, update) for bucket, update in updates.items()],
+            ordered=False
+        )
+        apply_score_deltas(deltas)
+        apply_regrades(db, regraded)
+        apply_analytics_regrades(db[ANALYTICS_COLLECTION], regraded)
     
-    return suspicious
+    return len(changes)
+
+
+def get_suspicious_users():
+    """
+    Get users with suspicious patterns. The detector (data.anticheat) raises
+    and clears alerts as answers are logged; this only reads the raised ones.
+    """
+    return get_alerts()
 
 
 def flag_user(username):
@@ -144,6 +197,8 @@ def flag_user(username):
         {"_id": username},
         {"$set": {"flagged": True}}
     )
+    invalidate_leaderboard()
+    invalidate_rollup_cache()
 
 
 def unflag_user(username):
@@ -153,6 +208,8 @@ def unflag_user(username):
         {"_id": username},
         {"$set": {"flagged": False}}
     )
+    invalidate_leaderboard()
+    invalidate_rollup_cache()
 
 
 def reset_user_score(username):
@@ -172,12 +229,22 @@ def reset_user_score(username):
             }
         }
     )
+    # Period and per-deck leaderboards start over too, along with the raw
+    # sessions rebuild_rollups would otherwise add back
+    db[ROLLUP_COLLECTION].delete_many({"username": username})
+    db[HOURLY_ROLLUP_COLLECTION].delete_many({"username": username})
+    db[SESSION_BUCKETS].delete_many({"username": username})
+    # So do the anti-cheat statistics (the counters they mirror were reset)
+    # and the stats tab's analytics
+    clear_detector_state(username)
+    clear_user_analytics(username)
+    invalidate_leaderboard()
+    invalidate_rollup_cache()
 
 
 def get_leaderboard(limit=10):
-    """Get top users by score (exclude flagged)"""
-    db = get_db()
-    return list(db.users.find({"flagged": {"$ne": True}}).sort("total_score", -1).limit(limit))
+    """Get top users by score (exclude flagged), from the shared cached board"""
+    return get_top_users(limit)
 
 
 def make_admin(username):
@@ -0,0 +1,78 @@
+# data/write_behind.py
+"""Run per-user database writes off the script thread, in order"""
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from zlib import crc32
+
+
+# Each user's writes go to the same single-threaded lane, so they are applied
+# in the order they were submitted; different users' writes run in parallel.
+WRITE_LANES = 4
+
+_write_behind = None
+_write_behind_lock = threading.Lock()
+
+
+class WriteBehind:
+    """Ordered-per-key background execution of write functions"""
+
+    def __init__(self, lanes=WRITE_LANES):
+        self._lanes = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"write-behind-{lane}")
+            for lane in range(lanes)
+        ]
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, key, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) behind every earlier write for the same key
+        Returns:
+            Future with func's result (or the exception it raised)
+        """
+        lane = self._lanes[crc32(str(key).encode()) % len(self._lanes)]
+        with self._lock:
+            self.pending += 1
+        future = lane.submit(func, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            if future.exception() is not None:
+                self.failed += 1
+                print(f"Error in background write: {future.exception()}")
+            else:
+                self.completed += 1
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {"pending": self.pending, "completed": self.completed, "failed": self.failed}
+
+    def close(self):
+        """Finish every queued write"""
+        for lane in self._lanes:
+            lane.shutdown(wait=True)
+
+
+def get_write_behind():
+    """Get the process-wide write-behind executor"""
+    global _write_behind
+
+    if _write_behind is None:
+        with _write_behind_lock:
+            if _write_behind is None:
+                # Writers call get_db() from worker threads; make sure the
+                # connection was opened here, on the script thread
+                from data.db import get_db
+                get_db()
+                write_behind = WriteBehind()
+                atexit.register(write_behind.close)
+                _write_behind = write_behind
+
+    return _write_behind
@@ -4,9 +4,13 @@ import streamlit as st
 from typing import Optional
 
 
+# Users shown per page of the admin user list
+USER_PAGE_SIZE = 25
+
+
 def render_admin_panel(config=None):
     """Render admin control panel"""
-    from .core import get_auth_db, require_admin, is_admin
+    from .core import get_auth_db, get_session_store, require_admin, is_admin
     from .config import AuthConfig
     
     # Check admin access
@@ -24,15 +28,29 @@ def render_admin_panel(config=None):
     # User management
     st.markdown("### 👥 User Management")
     
-    all_users = db.get_all_users()
+    search = st.text_input("Search username (prefix)", key="admin_user_search").strip()
+    # Usernames the pages before the current one ended with (keyset pagination)
+    if st.session_state.get("admin_user_search_used") != search:
+        st.session_state.admin_user_search_used = search
+        st.session_state.admin_user_cursors = []
+    cursors = st.session_state.setdefault("admin_user_cursors", [])
+    
+    # One extra row tells whether there is a next page
+    page = db.list_users(prefix=search or None, after=cursors[-1] if cursors else None,
+                         limit=USER_PAGE_SIZE + 1)
+    has_next = len(page) > USER_PAGE_SIZE
+    page = page[:USER_PAGE_SIZE]
     
-    if not all_users:
-        st.info("No users in system")
+    if not page:
+        st.info("No matching users" if search or cursors else "No users in system")
+        if cursors and st.button("⬅️ First page"):
+            cursors.clear()
+            st.rerun()
         return
     
     # User table
     user_data = []
-    for user in all_users:
+    for user in page:
         user_data.append({
             "Username": user["_id"],
             "Admin": "✅" if user.get("is_admin") else "❌",
@@ -42,6 +60,21 @@ def render_admin_panel(config=None):
     
     st.dataframe(user_data, width="stretch")
     
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Previous", disabled=not cursors, width="stretch"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(
+            f"Page {len(cursors) + 1} · {db.count_users(search or None):,} "
+            f"{'matching ' if search else ''}users"
+        )
+    with col3:
+        if st.button("Next ➡️", disabled=not has_next, width="stretch"):
+            cursors.append(page[-1]["_id"])
+            st.rerun()
+    
     st.divider()
     
     # User actions
@@ -49,7 +82,7 @@ def render_admin_panel(config=None):
     
     selected_user = st.selectbox(
         "Select user:",
-        options=[u["_id"] for u in all_users]
+        options=[u["_id"] for u in page]
     )
     
     if selected_user:
@@ -79,9 +112,76 @@ def render_admin_panel(config=None):
             if st.button("Delete User", type="secondary", width="stretch"):
                 if st.session_state.get("confirm_delete") == selected_user:
                     db.delete_user(selected_user)
+                    get_session_store(config).revoke_user(selected_user)
                     st.success(f"Deleted {selected_user}")
                     st.session_state.confirm_delete = None
                     st.rerun()
                 else:
                     st.session_state.confirm_delete = selected_user
                     st.warning("Click again to confirm deletion")
+    
+    st.divider()
+    render_db_activity(config)
+
+
+def render_db_activity(config):
+    """Connection health, pool usage and (if enabled) per-rerun command stats"""
+    from .connection import get_connection_manager
+    from .instrumentation import get_command_stats
+    
+    st.markdown("### 📈 Database Activity")
+    
+    manager = get_connection_manager(config.mongo_uri)
+    health = manager.health()
+    if health["ok"]:
+        st.caption(f"✅ Ping {health['latency_ms']:.1f} ms")
+    else:
+        st.error(f"❌ {health['error']}")
+    
+    with st.expander("Connection pool"):
+        st.json(manager.pool_stats())
+    
+    with st.expander("Password hashing"):
+        from .passwords import get_password_hasher
+        st.json(get_password_hasher().stats())
+    
+    stats = get_command_stats()
+    if stats is None:
+        st.info("Command instrumentation is off. Set `instrument = true` under [mongo] in secrets to enable it.")
+        return
+    
+    snapshot = stats.snapshot()
+    callers = sorted(snapshot["by_caller"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+    st.markdown("**By calling function**")
+    st.dataframe([
+        {
+            "Function": name,
+            "Calls": c["count"],
+            "Errors": c["errors"],
+            "Total ms": round(c["total_ms"], 1),
+            "Avg ms": round(c["total_ms"] / c["count"], 2) if c["count"] else 0,
+            "Max ms": round(c["max_ms"], 1)
+        }
+        for name, c in callers
+    ], width="stretch")
+    
+    st.markdown("**Recent reruns**")
+    st.dataframe([
+        {
+            "Session": (r["session"] or "")[:8],
+            "Commands": r["commands"],
+            "Total ms": round(r["total_ms"], 1),
+            "Chattiest": max(r["by_caller"], key=r["by_caller"].get) if r["by_caller"] else ""
+        }
+        for r in reversed(snapshot["reruns"][-20:])
+    ], width="stretch")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("Prometheus", stats.to_prometheus(), "mongo_metrics.prom", width="stretch")
+    with col2:
+        st.download_button("JSON lines", stats.to_json_lines(), "mongo_reruns.jsonl", width="stretch")
+    with col3:
+        if st.button("Reset stats", width="stretch"):
+            stats.reset()
+            st.rerun()
@@ -1,6 +1,6 @@
 # streamlit_auth/config.py
 """Configuration for auth module"""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 
@@ -11,6 +11,10 @@ class AuthConfig:
     # MongoDB settings
     mongo_uri: str
     db_name: str
+    # Extra MongoClient options for the shared pool (see connection.py)
+    pool_options: dict = field(default_factory=dict)
+    # Record per-rerun command counts and timings (admin panel)
+    instrument: bool = False
     
     # Collection names
     users_collection: str = "users"
@@ -22,8 +26,10 @@ class AuthConfig:
     require_email: bool = False
     allow_registration: bool = True
     
-    # Session settings
+    # Session settings: a login lasts at most session_expiry_days; the token in
+    # the URL expires after session_idle_minutes unless the app is in use
     session_expiry_days: int = 7
+    session_idle_minutes: int = 60
     
     @classmethod
     def from_secrets(cls, secrets_key: str = "mongo"):
@@ -32,5 +38,7 @@ class AuthConfig:
         return cls(
             mongo_uri=st.secrets[secrets_key]["uri"],
             db_name=st.secrets[secrets_key]["db_name"],
+            pool_options=dict(st.secrets[secrets_key].get("pool", {})),
+            instrument=bool(st.secrets[secrets_key].get("instrument", False)),
             app_name=st.secrets.get("app", {}).get("name", "Streamlit App")
         )
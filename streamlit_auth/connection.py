@@ -0,0 +1,169 @@
+# streamlit_auth/connection.py
+"""Shared MongoDB connection management"""
+import threading
+import time
+from typing import Dict, Optional
+
+import certifi
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+from .instrumentation import get_command_stats
+
+
+# Defaults for every shared client; override with a [mongo.pool] secrets
+# table using pymongo option names (maxPoolSize, maxIdleTimeMS, ...)
+DEFAULT_POOL_OPTIONS = {
+    "maxPoolSize": 50,
+    "minPoolSize": 0,
+    "maxIdleTimeMS": 5 * 60 * 1000,
+    "compressors": "zlib",
+    "serverSelectionTimeoutMS": 30000,
+    "connectTimeoutMS": 30000,
+    "socketTimeoutMS": 30000,
+}
+
+_managers: Dict[str, "ConnectionManager"] = {}
+_managers_lock = threading.Lock()
+
+
+class _PoolStats(ConnectionPoolListener):
+    """Count connection pool events for a client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def _add(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "open_connections": self.created - self.closed,
+                "in_use": self.checked_out,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add("pool_clears")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add("checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._add("checkouts")
+        self._add("checked_out")
+
+    def connection_checked_in(self, event):
+        self._add("checked_out", -1)
+
+
+class ConnectionManager:
+    """One MongoClient (and connection pool) per URI, shared by every caller"""
+
+    def __init__(self, uri: str, instrument: bool = False, **pool_options):
+        self.uri = uri
+        self.instrument = instrument
+        self.options = {**DEFAULT_POOL_OPTIONS, **pool_options}
+        self._stats = _PoolStats()
+        self._client = None
+        self._warmed_up = False
+        self._lock = threading.RLock()
+
+    @property
+    def client(self) -> MongoClient:
+        """The shared client; constructing it does no network I/O"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    listeners = [self._stats]
+                    if self.instrument:
+                        listeners.append(get_command_stats(create=True))
+                    self._client = MongoClient(
+                        self.uri,
+                        tlsCAFile=certifi.where(),
+                        event_listeners=listeners,
+                        **self.options
+                    )
+        return self._client
+
+    def get_database(self, db_name: str):
+        """Get a database handle, pinging the server once per process on first use"""
+        if not self._warmed_up:
+            with self._lock:
+                if not self._warmed_up:
+                    # Raises ServerSelectionTimeoutError for callers to report
+                    self.client.admin.command('ping')
+                    self._warmed_up = True
+        return self.client[db_name]
+
+    def health(self) -> Dict:
+        """Ping the server and report round-trip latency"""
+        start = time.perf_counter()
+        try:
+            self.client.admin.command('ping')
+            return {"ok": True, "latency_ms": (time.perf_counter() - start) * 1000}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def pool_stats(self) -> Dict:
+        """Connection pool counters plus the effective pool options"""
+        return {
+            **self._stats.snapshot(),
+            "max_pool_size": self.options.get("maxPoolSize"),
+            "max_idle_time_ms": self.options.get("maxIdleTimeMS"),
+            "compressors": self.options.get("compressors"),
+        }
+
+    def close(self):
+        """Close the client and its pool"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+                self._warmed_up = False
+
+
+def get_connection_manager(uri: str, pool_options: Optional[Dict] = None,
+                           instrument: bool = False) -> ConnectionManager:
+    """Get the process-wide connection manager for a URI (first caller's options win)"""
+    manager = _managers.get(uri)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(uri)
+            if manager is None:
+                manager = ConnectionManager(uri, instrument, **(pool_options or {}))
+                _managers[uri] = manager
+    return manager
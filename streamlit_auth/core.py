@@ -3,17 +3,20 @@
 import streamlit as st
 from typing import Optional, Callable
 from functools import wraps
-import hashlib
-import time
 
 
 # Import from the auth module's database, NOT data/db.py
 from .database import AuthDatabase
 from .config import AuthConfig
+from .sessions import SessionStore
 
 
 # Global database instance
 _auth_db = None
+_session_store = None
+
+# URL query parameter carrying the session token
+SESSION_QUERY_PARAM = "session"
 
 
 def get_auth_db(config=None):
@@ -28,45 +31,96 @@ def get_auth_db(config=None):
     return _auth_db
 
 
-def _create_session_token(username: str) -> str:
-    """Create a simple session token"""
-    timestamp = str(int(time.time()))
-    return hashlib.sha256(f"{username}:{timestamp}".encode()).hexdigest()[:16]
+def get_session_store(config=None) -> SessionStore:
+    """Get or create the server-side session store"""
+    global _session_store
+    
+    if _session_store is None:
+        db = get_auth_db(config)
+        _session_store = SessionStore(
+            db.db[db.config.sessions_collection],
+            db.config.session_expiry_days,
+            db.config.session_idle_minutes
+        )
+    
+    return _session_store
 
 
-def _persist_login(username: str):
-    """Store login token in session state with timestamp"""
-    token = _create_session_token(username)
+def _set_token(token: str):
     st.session_state['auth_token'] = token
-    st.session_state['auth_username'] = username
-    st.session_state['auth_timestamp'] = time.time()
+    # Survives browser refreshes (session_state does not)
+    st.query_params[SESSION_QUERY_PARAM] = token
+
+
+def _load_user(username: str, config=None) -> bool:
+    """
+    Put a user's document in session_state, remembering the user version
+    of the session it was read for. False if the user is gone or inactive.
+    """
+    user = get_auth_db(config).get_user(username)
+    if not user or not user.get("is_active", True):
+        return False
+    st.session_state.username = username
+    st.session_state.user_data = user
+    st.session_state['auth_user_version'] = get_session_store().user_version(
+        st.session_state.get('auth_token')
+    )
+    return True
+
+
+def _persist_login(username: str):
+    """Start a server-side session and remember its token in the URL"""
+    _set_token(get_session_store().create(username))
 
 
 def _check_persisted_login() -> Optional[str]:
-    """Check if user has a valid persisted session"""
-    if 'auth_token' in st.session_state and 'auth_username' in st.session_state:
-        # Check if session is still valid (7 days)
-        timestamp = st.session_state.get('auth_timestamp', 0)
-        if time.time() - timestamp < (7 * 24 * 3600):  # 7 days
-            return st.session_state['auth_username']
-    return None
+    """
+    Check if user has a valid persisted session.
+    A token restored from the URL (a refresh, bookmark or copied link) is
+    exchanged for a new one, so every URL token logs in at most once and the
+    ones left in browser history or logs are already dead.
+    """
+    store = get_session_store()
+    token = st.session_state.get('auth_token')
+    if token:
+        username = store.validate(token)
+        if username:
+            renewed = store.renew(token)
+            if renewed is None:
+                return None
+            if renewed != token:
+                _set_token(renewed)
+        return username
+    
+    rotated = store.rotate(st.query_params.get(SESSION_QUERY_PARAM))
+    if rotated is None:
+        return None
+    username, token = rotated
+    _set_token(token)
+    return username
 
 
 def init_auth(config=None):
     """Initialize authentication system"""
-    # Check for persisted login first
-    if "username" not in st.session_state:
+    # Check for persisted login first. Within a browser session the user
+    # document is kept in session_state; it is read again only when a
+    # session is restored or its user version (bumped by user_changed when
+    # roles or the active flag change) differs from the one it was read for.
+    if st.session_state.get("username") is None:
         persisted_user = _check_persisted_login()
-        if persisted_user:
-            # Restore session from persisted login
-            db = get_auth_db(config)
-            user = db.get_user(persisted_user)
-            if user and user.get("is_active", True):
-                st.session_state.username = persisted_user
-                st.session_state.user_data = user
-            else:
-                # Invalid session, clear it
-                _clear_persisted_login()
+        if persisted_user and not _load_user(persisted_user, config):
+            # Invalid session, clear it
+            _clear_persisted_login()
+    
+    elif st.session_state.get("auth_token"):
+        # Still a valid session? (answered from memory on most reruns)
+        if _check_persisted_login() != st.session_state.username:
+            logout_user()
+        elif (get_session_store().user_version(st.session_state.auth_token)
+              != st.session_state.get('auth_user_version')):
+            # The user changed since it was read
+            if not _load_user(st.session_state.username, config):
+                logout_user()
     
     if "username" not in st.session_state:
         st.session_state.username = None
@@ -78,7 +132,10 @@ def init_auth(config=None):
 
 
 def login_user(username: str, password: str) -> bool:
-    """Login user with credentials"""
+    """
+    Login user with credentials
+    Raises PasswordHasherBusy when too many logins are in progress
+    """
     db = get_auth_db()
     user = db.authenticate(username, password)
     
@@ -86,19 +143,21 @@ def login_user(username: str, password: str) -> bool:
         st.session_state.username = username
         st.session_state.user_data = user
         _persist_login(username)  # Persist the login
+        st.session_state['auth_user_version'] = None
         return True
     
     return False
 
 
 def _clear_persisted_login():
-    """Clear persisted login data"""
+    """End the server-side session and clear persisted login data"""
+    token = st.session_state.get('auth_token') or st.query_params.get(SESSION_QUERY_PARAM)
+    if token:
+        get_session_store().revoke(token)
     if 'auth_token' in st.session_state:
         del st.session_state.auth_token
-    if 'auth_username' in st.session_state:
-        del st.session_state.auth_username
-    if 'auth_timestamp' in st.session_state:
-        del st.session_state.auth_timestamp
+    if SESSION_QUERY_PARAM in st.query_params:
+        del st.query_params[SESSION_QUERY_PARAM]
 
 
 def logout_user():
@@ -107,6 +166,8 @@ def logout_user():
         del st.session_state.username
     if "user_data" in st.session_state:
         del st.session_state.user_data
+    if 'auth_user_version' in st.session_state:
+        del st.session_state.auth_user_version
     _clear_persisted_login()
 
 
@@ -1,18 +1,22 @@
 # streamlit_auth/database.py
 """Database operations for user management"""
-from pymongo import MongoClient
+import re
 from pymongo.errors import ServerSelectionTimeoutError
 from datetime import datetime
 from typing import Optional, Dict, List
-import certifi
 
+from .connection import get_connection_manager
+from .passwords import get_password_hasher
+
+
+# Fields the admin user list shows
+USER_LIST_FIELDS = {"_id": 1, "email": 1, "is_admin": 1, "is_active": 1, "total_score": 1}
 
 class AuthDatabase:
     """Handle all database operations for authentication"""
     
     def __init__(self, config):
         self.config = config
-        self._client = None
         self._db = None
     
     @property
@@ -22,19 +26,10 @@ class AuthDatabase:
             return self._db
         
         try:
-            import streamlit as st
-            
-            self._client = MongoClient(
-                self.config.mongo_uri,
-                tlsCAFile=certifi.where(),
-                serverSelectionTimeoutMS=30000,
-                connectTimeoutMS=30000,
-                socketTimeoutMS=30000,
+            manager = get_connection_manager(
+                self.config.mongo_uri, self.config.pool_options, self.config.instrument
             )
-            
-            # Test connection
-            self._client.admin.command('ping')
-            self._db = self._client[self.config.db_name]
+            self._db = manager.get_database(self.config.db_name)
             
             return self._db
             
@@ -53,11 +48,16 @@ class AuthDatabase:
 
     def create_user(self, username: str, password: str, 
                 email: Optional[str] = None, is_admin: bool = False) -> bool:
-        """Create new user"""
+        """
+        Create new user
+        Raises PasswordHasherBusy when too many passwords are being hashed
+        """
+        # Hashed first, so a busy hasher is reported rather than taken for a failure
+        password_hash = get_password_hasher().hash(password)
         try:
             user_doc = {
                 "_id": username,
-                "password": password,
+                "password": password_hash,
                 "email": email,
                 "is_admin": is_admin,
                 "created_at": datetime.utcnow(),
@@ -80,12 +80,15 @@ class AuthDatabase:
         
         
     def update_user(self, username: str, updates: Dict) -> bool:
-        """Update user fields"""
+        """Update user fields (the user's logged-in sessions reload the user)"""
+        from .core import get_session_store
+        
         try:
             self.db[self.config.users_collection].update_one(
                 {"_id": username},
                 {"$set": updates}
             )
+            get_session_store(self.config).user_changed(username)
             return True
         except:
             return False
@@ -99,11 +102,53 @@ class AuthDatabase:
             return False
 
     def get_all_users(self) -> List[Dict]:
-        """Get all users (without passwords)"""
+        """Get all users (without passwords). Loads every user; prefer list_users."""
         return list(self.db[self.config.users_collection].find(
             {}, {"password": 0}
         ))
 
+    @staticmethod
+    def _username_filter(prefix: Optional[str]) -> Dict:
+        # An anchored, case-sensitive prefix regex is answered from the _id index
+        return {"_id": {"$regex": f"^{re.escape(prefix)}"}} if prefix else {}
+
+    def list_users(self, prefix: Optional[str] = None, after: Optional[str] = None,
+                   limit: int = 50, fields: Optional[Dict] = None) -> List[Dict]:
+        """
+        One page of users in username order
+        Args:
+            prefix: Only usernames starting with this
+            after: Username the previous page ended with (None for the first page)
+            limit: Page size
+            fields: Projection (defaults to USER_LIST_FIELDS; never the password)
+        """
+        query = self._username_filter(prefix)
+        if after is not None:
+            query.setdefault("_id", {})["$gt"] = after
+        projection = dict(fields or USER_LIST_FIELDS)
+        projection.pop("password", None)
+        return list(
+            self.db[self.config.users_collection]
+            .find(query, projection)
+            .sort("_id", 1)
+            .limit(limit)
+        )
+
+    def count_users(self, prefix: Optional[str] = None) -> int:
+        """Number of users (starting with prefix, if given)"""
+        collection = self.db[self.config.users_collection]
+        if not prefix:
+            return collection.estimated_document_count()
+        return collection.count_documents(self._username_filter(prefix))
+
+    def find_admins(self, limit: int = 10, fields: Optional[Dict] = None) -> List[Dict]:
+        """Admin accounts (username and email by default)"""
+        return list(
+            self.db[self.config.users_collection]
+            .find({"is_admin": True}, fields or {"_id": 1, "email": 1})
+            .limit(limit)
+        )
+
     def make_admin(self, username: str) -> bool:
         """Grant admin privileges"""
         return self.update_user(username, {"is_admin": True})
@@ -113,8 +158,24 @@ class AuthDatabase:
         return self.update_user(username, {"is_admin": False})
 
     def authenticate(self, username: str, password: str) -> Optional[Dict]:
-        """Authenticate user credentials"""
+        """
+        Authenticate user credentials. The password is checked in the hashing
+        pool; accounts still holding a plain-text (or outdated) password are
+        rehashed on a successful login.
+        Raises PasswordHasherBusy if too many logins are being checked.
+        """
         user = self.get_user(username)
-        if user and user.get("password") == password and user.get("is_active", True):
-            return user
-        return None
+        if not user or not user.get("is_active", True):
+            return None
+        
+        ok, rehashed = get_password_hasher().verify(password, user.get("password"))
+        if not ok:
+            return None
+        if rehashed:
+            # Only replace the password that was checked (a concurrent change wins)
+            self.db[self.config.users_collection].update_one(
+                {"_id": username, "password": user.get("password")},
+                {"$set": {"password": rehashed}}
+            )
+            user["password"] = rehashed
+        return user
@@ -0,0 +1,161 @@
+# streamlit_auth/instrumentation.py
+"""Opt-in MongoDB command instrumentation (per rerun, per calling function)"""
+import json
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from pymongo.monitoring import CommandListener
+
+
+# Modules whose functions count as "the caller" of a database command. The
+# outermost function of these modules on the stack gets the command, so a
+# find_one issued by a helper is attributed to the get_deck that called it.
+DATA_LAYER_MODULES = ("data.", "streamlit_auth.database")
+RECENT_RERUNS = 200
+
+_local = threading.local()
+
+
+def _calling_function() -> str:
+    """Name the outermost data-layer function on the current stack"""
+    frame = sys._getframe(2)
+    caller = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(DATA_LAYER_MODULES):
+            caller = f"{module}.{frame.f_code.co_qualname}"
+        elif caller is not None:
+            break
+        frame = frame.f_back
+    return caller or "other"
+
+
+def _session_id() -> Optional[str]:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+
+class CommandStats(CommandListener):
+    """Collect command counts and timings from a MongoClient"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.by_caller: Dict[str, Dict] = {}
+        self.by_command: Dict[str, Dict] = {}
+        self.reruns = deque(maxlen=RECENT_RERUNS)
+
+    # Rerun tracking
+
+    def begin_rerun(self, label: Optional[str] = None):
+        """Start attributing this thread's commands to a new script rerun"""
+        rerun = {
+            "started_at": time.time(),
+            "session": _session_id(),
+            "label": label,
+            "commands": 0,
+            "total_ms": 0.0,
+            "by_caller": {},
+        }
+        with self._lock:
+            self.reruns.append(rerun)
+        _local.rerun = rerun
+
+    # CommandListener
+
+    def started(self, event):
+        with self._lock:
+            self._pending[event.request_id] = (_calling_function(), getattr(_local, "rerun", None))
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed):
+        duration_ms = event.duration_micros / 1000
+        with self._lock:
+            caller, rerun = self._pending.pop(event.request_id, ("other", None))
+            for table, key in ((self.by_caller, caller), (self.by_command, event.command_name)):
+                stats = table.setdefault(key, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+                stats["count"] += 1
+                stats["errors"] += int(failed)
+                stats["total_ms"] += duration_ms
+                stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            if rerun is not None:
+                rerun["commands"] += 1
+                rerun["total_ms"] += duration_ms
+                rerun["by_caller"][caller] = rerun["by_caller"].get(caller, 0) + 1
+
+    # Reporting
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "by_caller": {k: dict(v) for k, v in self.by_caller.items()},
+                "by_command": {k: dict(v) for k, v in self.by_command.items()},
+                "reruns": [dict(r, by_caller=dict(r["by_caller"])) for r in self.reruns],
+            }
+
+    def to_json_lines(self) -> str:
+        """One JSON object per recent rerun"""
+        return "\n".join(json.dumps(rerun, default=str) for rerun in self.snapshot()["reruns"])
+
+    def to_prometheus(self) -> str:
+        """Per-caller and per-command totals in Prometheus text format"""
+        snapshot = self.snapshot()
+        lines = []
+        for metric, help_text, field in (
+            ("mongo_commands_total", "MongoDB commands issued", "count"),
+            ("mongo_command_errors_total", "MongoDB commands that failed", "errors"),
+            ("mongo_command_seconds_total", "Time spent in MongoDB commands", "total_ms"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for label, table in (("caller", snapshot["by_caller"]), ("command", snapshot["by_command"])):
+                for key, stats in sorted(table.items()):
+                    value = stats[field] / 1000 if field == "total_ms" else stats[field]
+                    escaped = key.replace("\\", "\\\\").replace('"', '\\"')
+                    lines.append(f'{metric}{{{label}="{escaped}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.by_caller.clear()
+            self.by_command.clear()
+            self.reruns.clear()
+
+
+_stats: Optional[CommandStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_command_stats(create: bool = False) -> Optional[CommandStats]:
+    """The process-wide command listener (None unless instrumentation is enabled)"""
+    global _stats
+
+    if _stats is None and create:
+        with _stats_lock:
+            if _stats is None:
+                _stats = CommandStats()
+    return _stats
+
+
+def begin_rerun(label: Optional[str] = None):
+    """Mark the start of a script rerun; a no-op when instrumentation is off"""
+    stats = get_command_stats()
+    if stats is not None:
+        stats.begin_rerun(label)
+
+
+def recent_reruns(limit: int = 20) -> List[Dict]:
+    stats = get_command_stats()
+    return stats.snapshot()["reruns"][-limit:] if stats is not None else []
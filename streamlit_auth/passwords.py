@@ -0,0 +1,230 @@
+# streamlit_auth/passwords.py
+"""Password hashing (scrypt), run in a small process pool"""
+import atexit
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+
+# scrypt cost: 2**14 * 8 * 128 bytes = 16 MB of memory and a few tens of ms
+# of CPU per hash. Raising these rehashes each user on their next login.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+HASH_PREFIX = "scrypt"
+
+# Hashing runs in worker processes so it never holds the GIL of the server
+# that renders everyone's reruns. At most HASH_WORKERS hashes run at once and
+# at most MAX_PENDING_HASHES are queued or running; a login that can't get a
+# slot within HASH_QUEUE_TIMEOUT_SECONDS is told to retry.
+HASH_WORKERS = 2
+MAX_PENDING_HASHES = 16
+HASH_QUEUE_TIMEOUT_SECONDS = 5
+# Queue times kept for the admin panel's percentiles
+RECENT_TIMINGS = 500
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+class PasswordHasherBusy(Exception):
+    """Too many logins are being checked right now; try again shortly"""
+
+
+def hash_password(password: str) -> str:
+    """Hash a password as "scrypt$n$r$p$salt$hash" (hex salt and hash)"""
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(
+        password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=HASH_BYTES
+    )
+    return f"{HASH_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored: Optional[str]) -> bool:
+    """Whether a stored password is a hash (older accounts stored plain text)"""
+    return bool(stored) and stored.startswith(HASH_PREFIX + "$")
+
+
+def needs_rehash(stored: Optional[str]) -> bool:
+    """Whether a stored password is plain text or hashed with outdated parameters"""
+    if not is_hashed(stored):
+        return True
+    return stored.split("$")[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+def verify_password(password: str, stored: Optional[str]) -> bool:
+    """Check a password against a stored hash (or a legacy plain-text password)"""
+    if not stored:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = bytes.fromhex(digest)
+        actual = hashlib.scrypt(
+            password.encode(), salt=bytes.fromhex(salt),
+            n=int(n), r=int(r), p=int(p), dklen=len(expected)
+        )
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+# Worker-process entry points. Each returns when it started, so the caller
+# can tell time spent waiting in the queue from time spent hashing.
+
+def _hash_job(password: str) -> Tuple[float, str]:
+    return time.time(), hash_password(password)
+
+
+def _verify_job(password: str, stored: Optional[str]) -> Tuple[float, bool, Optional[str]]:
+    started_at = time.time()
+    ok = verify_password(password, stored)
+    # Rehash in the same trip to the worker so migration costs no extra wait
+    rehashed = hash_password(password) if ok and needs_rehash(stored) else None
+    return started_at, ok, rehashed
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for password hashing, with queue-time metrics.
+    Calls block the calling script thread only while waiting for the result.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = MAX_PENDING_HASHES):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.rehashed = 0
+        self._queue_ms = []
+        self._hash_ms = []
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Fresh interpreters rather than forks of the (threaded) server
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _replace_pool(self, broken):
+        """Drop a broken pool (unless another thread already has) and shut it down"""
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job, *args):
+        if not self._slots.acquire(timeout=HASH_QUEUE_TIMEOUT_SECONDS):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+
+        submitted_at = time.time()
+        with self._lock:
+            self.pending += 1
+        try:
+            pool = self._get_pool()
+            try:
+                result = pool.submit(job, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a new pool
+                self._replace_pool(pool)
+                result = self._get_pool().submit(job, *args).result()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+        finished_at = time.time()
+        started_at = result[0]
+        with self._lock:
+            self.completed += 1
+            self._queue_ms.append(max(0.0, started_at - submitted_at) * 1000)
+            self._hash_ms.append(max(0.0, finished_at - started_at) * 1000)
+            del self._queue_ms[:-RECENT_TIMINGS]
+            del self._hash_ms[:-RECENT_TIMINGS]
+        return result[1:]
+
+    def hash(self, password: str) -> str:
+        """Hash a new password"""
+        return self._run(_hash_job, password)[0]
+
+    def verify(self, password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password
+        Returns:
+            (matches, new hash to store if the stored one is plain text or outdated)
+        """
+        ok, rehashed = self._run(_verify_job, password, stored)
+        if rehashed:
+            with self._lock:
+                self.rehashed += 1
+        return ok, rehashed
+
+    def stats(self) -> Dict:
+        """Counters and queue/hash time percentiles (ms) for monitoring"""
+        def percentiles(values):
+            if not values:
+                return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+            ordered = sorted(values)
+            return {
+                "p50": round(ordered[len(ordered) // 2], 1),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                "max": round(ordered[-1], 1)
+            }
+
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "rehashed": self.rehashed,
+                "queue_ms": percentiles(self._queue_ms),
+                "hash_ms": percentiles(self._hash_ms)
+            }
+
+    def close(self):
+        """Stop the worker processes"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Get the process-wide password hasher"""
+    global _hasher
+
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                hasher = PasswordHasher()
+                atexit.register(hasher.close)
+                _hasher = hasher
+
+    return _hasher
@@ -0,0 +1,175 @@
+# streamlit_auth/sessions.py
+"""Server-side login sessions"""
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from bson import ObjectId
+
+
+# Validated tokens are trusted from memory for this long before MongoDB is
+# asked again (so a logout in another process takes effect within it)
+SESSION_CACHE_SECONDS = 60
+# Stale cache entries are dropped once the cache grows past this
+SESSION_CACHE_MAX_ENTRIES = 10000
+
+
+class SessionStore:
+    """
+    Login tokens stored in MongoDB, one document per token:
+        {"_id": token, "username": str, "login_at": datetime,
+         "created_at": datetime, "expires_at": datetime,
+         "user_version": ObjectId (set by user_changed) or None}
+    A TTL index on expires_at lets MongoDB remove expired sessions.
+    user_version comes back with every validation read, so a session notices
+    changes to its user (roles, deactivation) without reading the user.
+    
+    Tokens travel in the page URL, so each one is short-lived (idle_minutes)
+    and is swapped for a fresh one by rotate() and renew(). A login lasts at
+    most expiry_days however often its token is rotated.
+    """
+
+    def __init__(self, collection, expiry_days: int = 7, idle_minutes: int = 60):
+        self.collection = collection
+        self.expiry = timedelta(days=expiry_days)
+        self.idle = timedelta(minutes=idle_minutes)
+        # token -> (username, expires_at, checked_at, user_version)
+        self._cache: Dict[str, Tuple[str, datetime, float, Optional[ObjectId]]] = {}
+        self._lock = threading.Lock()
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self.collection.create_index("username")
+        except Exception as e:
+            print(f"Error creating sessions indexes: {e}")
+
+    def create(self, username: str, login_at: Optional[datetime] = None,
+               user_version: Optional[ObjectId] = None) -> str:
+        """Start a session (or continue the login made at login_at) and return its token"""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        login_at = login_at or now
+        expires_at = min(now + self.idle, login_at + self.expiry)
+        self.collection.insert_one({
+            "_id": token,
+            "username": username,
+            "login_at": login_at,
+            "created_at": now,
+            "expires_at": expires_at,
+            "user_version": user_version
+        })
+        with self._lock:
+            self._cache[token] = (username, expires_at, time.time(), user_version)
+            if len(self._cache) > SESSION_CACHE_MAX_ENTRIES:
+                cutoff = time.time() - SESSION_CACHE_SECONDS
+                for stale in [t for t, entry in self._cache.items() if entry[2] < cutoff]:
+                    del self._cache[stale]
+        return token
+
+    def validate(self, token: Optional[str]) -> Optional[str]:
+        """Return the username a token belongs to, or None if it isn't valid"""
+        if not token:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(token)
+        if cached and time.time() - cached[2] < SESSION_CACHE_SECONDS:
+            return cached[0] if cached[1] > datetime.utcnow() else None
+
+        try:
+            session = self.collection.find_one({"_id": token}, {"username": 1, "expires_at": 1, "user_version": 1})
+        except Exception as e:
+            print(f"Error validating session: {e}")
+            # Keep a known session working through a brief outage
+            return cached[0] if cached and cached[1] > datetime.utcnow() else None
+
+        with self._lock:
+            if session is None or session["expires_at"] <= datetime.utcnow():
+                self._cache.pop(token, None)
+                return None
+            self._cache[token] = (
+                session["username"], session["expires_at"], time.time(), session.get("user_version")
+            )
+        return session["username"]
+
+    def user_version(self, token: Optional[str]) -> Optional[ObjectId]:
+        """The user version a token's session last saw (call after validate)"""
+        with self._lock:
+            cached = self._cache.get(token)
+        return cached[3] if cached else None
+
+    def user_changed(self, username: str):
+        """
+        Mark a user's sessions so they reload the user document (after their
+        roles or active flag changed); other processes notice within
+        SESSION_CACHE_SECONDS
+        """
+        version = ObjectId()
+        with self._lock:
+            for token, entry in self._cache.items():
+                if entry[0] == username:
+                    self._cache[token] = entry[:3] + (version,)
+        try:
+            self.collection.update_many({"username": username}, {"$set": {"user_version": version}})
+        except Exception as e:
+            print(f"Error updating sessions: {e}")
+
+    def rotate(self, token: Optional[str]) -> Optional[Tuple[str, str]]:
+        """
+        Exchange a valid token for a new one of the same login. The old token
+        stops working at once, so it can only be exchanged once.
+        Returns:
+            (username, new token), or None if the token isn't valid (or was
+            already exchanged)
+        """
+        if not token:
+            return None
+        with self._lock:
+            self._cache.pop(token, None)
+        try:
+            session = self.collection.find_one_and_delete(
+                {"_id": token, "expires_at": {"$gt": datetime.utcnow()}}
+            )
+            if session is None:
+                return None
+            login_at = session.get("login_at", session["created_at"])
+            if login_at + self.expiry <= datetime.utcnow():
+                return None
+            return session["username"], self.create(session["username"], login_at, session.get("user_version"))
+        except Exception as e:
+            print(f"Error rotating session: {e}")
+            return None
+
+    def renew(self, token: str) -> Optional[str]:
+        """
+        Keep an active session alive: the token itself while more than half
+        its idle time is left, otherwise a new one (None if that fails)
+        """
+        with self._lock:
+            cached = self._cache.get(token)
+        if cached and cached[1] - datetime.utcnow() > self.idle / 2:
+            return token
+        rotated = self.rotate(token)
+        return rotated[1] if rotated else None
+
+    def revoke(self, token: Optional[str]):
+        """End a session"""
+        if not token:
+            return
+        with self._lock:
+            self._cache.pop(token, None)
+        try:
+            self.collection.delete_one({"_id": token})
+        except Exception as e:
+            print(f"Error revoking session: {e}")
+
+    def revoke_user(self, username: str):
+        """End every session of a user (e.g. when the account is deleted)"""
+        with self._lock:
+            for token in [t for t, entry in self._cache.items() if entry[0] == username]:
+                del self._cache[token]
+        try:
+            self.collection.delete_many({"username": username})
+        except Exception as e:
+            print(f"Error revoking sessions: {e}")
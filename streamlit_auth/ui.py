@@ -4,9 +4,37 @@ import streamlit as st
 from typing import Optional
 
 
+def _try_login(username: str, password: str) -> bool:
+    """Log in, showing why not if it fails"""
+    from .core import login_user
+    from .passwords import PasswordHasherBusy
+    
+    try:
+        if login_user(username, password):
+            return True
+        st.error("❌ Invalid credentials")
+    except PasswordHasherBusy:
+        st.warning("⏳ Lots of people are logging in right now. Please try again in a moment.")
+    return False
+
+
+def _try_register(username: str, password: str, email: Optional[str]):
+    """Create an account, showing the outcome"""
+    from .core import get_auth_db
+    from .passwords import PasswordHasherBusy
+    
+    try:
+        if get_auth_db().create_user(username, password, email):
+            st.success("✅ Account created! Please login.")
+        else:
+            st.error("Failed to create account")
+    except PasswordHasherBusy:
+        st.warning("⏳ Lots of people are signing up right now. Please try again in a moment.")
+
+
 def render_sidebar_auth(config=None):
     """Render login/register in sidebar, return username if logged in"""
-    from .core import login_user, logout_user, get_current_user, get_user_data, get_auth_db
+    from .core import logout_user, get_current_user, get_user_data, get_auth_db
     from .config import AuthConfig
     
     current_user = get_current_user()
@@ -44,11 +72,9 @@ def render_sidebar_auth(config=None):
             
             if submit:
                 if username.strip() and password.strip():
-                    if login_user(username.strip(), password):
+                    if _try_login(username.strip(), password):
                         st.success("✅ Login successful!")
                         st.rerun()
-                    else:
-                        st.error("❌ Invalid credentials")
                 else:
                     st.error("Please enter username and password")
     
@@ -72,17 +98,13 @@ def render_sidebar_auth(config=None):
                         st.error("Username already exists")
                     else:
                         email_val = email if config.require_email else None
-                        if db.create_user(username.strip(), password, email_val):
-                            st.success("✅ Account created! Please login.")
-                        else:
-                            st.error("Failed to create account")
+                        _try_register(username.strip(), password, email_val)
     
     return None
 
 
 def render_login_page(config=None):
     """Render full-page login (alternative to sidebar)"""
-    from .core import login_user, get_auth_db
     from .config import AuthConfig
     
     if config is None:
@@ -105,11 +127,9 @@ def render_login_page(config=None):
                 
                 if submit:
                     if username.strip() and password.strip():
-                        if login_user(username.strip(), password):
+                        if _try_login(username.strip(), password):
                             st.success("✅ Login successful!")
                             st.rerun()
-                        else:
-                            st.error("❌ Invalid credentials")
         
         with tab2:
             if config.allow_registration:
@@ -125,12 +145,8 @@ def render_login_page(config=None):
                         if password != confirm:
                             st.error("Passwords don't match")
                         else:
-                            db = get_auth_db()
                             email_val = email if config.require_email else None
-                            if db.create_user(username.strip(), password, email_val):
-                                st.success("✅ Account created! Please login.")
-                            else:
-                                st.error("Failed to create account")
+                            _try_register(username.strip(), password, email_val)
             else:
                 st.info("Registration is disabled. Contact administrator.")
 
@@ -0,0 +1,138 @@
+# tests/test_answer_checking.py
+"""Parity of the fast answer matchers with the difflib reference"""
+import random
+
+import pytest
+
+from core.answer_checking import (
+    _bounded_lcs_ratio,
+    _char_masks,
+    check_answer,
+    check_answers_batch,
+    normalize_answer,
+)
+
+
+def lcs_length(a, b):
+    """Reference LCS by dynamic programming"""
+    previous = [0] * (len(b) + 1)
+    for char in a:
+        current = [0]
+        for j, other in enumerate(b, 1):
+            current.append(previous[j - 1] + 1 if char == other else max(previous[j], current[j - 1]))
+        previous = current
+    return previous[-1]
+
+
+def lcs_ratio(a, b):
+    total = len(a) + len(b)
+    return 2 * lcs_length(a, b) / total if total else 1.0
+
+
+# (user answer, correct answer) pairs like the ones students type
+TYPICAL_ANSWERS = [
+    ("adenine", "Adenine"),
+    ("adenin", "Adenine"),
+    ("thymine", "Adenine"),
+    ("guanine and cytosine", "Guanine, Cytosine"),
+    ("deoxyribonucleic acid", "Deoxyribonucleic acid."),
+    ("deoxyribose nucleic acid", "Deoxyribonucleic acid"),
+    ("ribonucleic acid", "Deoxyribonucleic acid"),
+    ("double helix", "Double helix"),
+    ("dubble helix", "Double helix"),
+    ("single strand", "Double helix"),
+    ("hydrogen bonds", "Hydrogen bonds"),
+    ("hydrogen bond", "Hydrogen bonds"),
+    ("covalent bonds", "Hydrogen bonds"),
+    ("dna polymerase", "DNA polymerase III"),
+    ("rna polymerase", "DNA polymerase"),
+    ("helicase unwinds the dna", "Helicase unwinds the DNA"),
+    ("the dna is unwound by helicase", "Helicase unwinds the DNA"),
+    ("mitochondria", "Mitochondria"),
+    ("nucleus", "Mitochondria"),
+    ("", "Adenine"),
+]
+
+
+def _mutate(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(0, max(1, len(chars) // 4))):
+        position = rng.randrange(len(chars) + 1)
+        action = rng.choice(("insert", "delete", "replace"))
+        if action == "insert" or not chars:
+            chars.insert(position, rng.choice("abcdefgh "))
+        elif action == "delete":
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars[min(position, len(chars) - 1)] = rng.choice("abcdefgh ")
+    return "".join(chars)
+
+
+def test_bit_parallel_lcs_matches_dynamic_programming():
+    rng = random.Random(11)
+    for _ in range(500):
+        a = "".join(rng.choice("acgt ") for _ in range(rng.randint(0, 60)))
+        b = "".join(rng.choice("acgt ") for _ in range(rng.randint(0, 60)))
+        # threshold 0 never exits early, so the ratio is exact
+        assert _bounded_lcs_ratio(a, b, _char_masks(b), 0.0) == pytest.approx(lcs_ratio(a, b))
+
+
+def test_edit_similarity_is_never_below_difflib():
+    # difflib's matching blocks form a common subsequence, so its ratio is a
+    # lower bound of the LCS ratio
+    rng = random.Random(5)
+    for _ in range(500):
+        correct = "".join(rng.choice("abcdefgh ") for _ in range(rng.randint(1, 40)))
+        user = _mutate(rng, correct)
+        _, edit = check_answer(user, correct, threshold=0.0, matcher="edit")
+        _, reference = check_answer(user, correct, threshold=0.0, matcher="difflib")
+        assert edit >= reference - 1e-9
+
+
+@pytest.mark.parametrize("user, correct", TYPICAL_ANSWERS)
+@pytest.mark.parametrize("matcher", ["fast", "edit"])
+def test_verdicts_agree_with_difflib_on_typical_answers(matcher, user, correct):
+    expected, _ = check_answer(user, correct, matcher="difflib")
+    if matcher == "fast" and not expected:
+        # fast also accepts answers with the words in another order
+        _, token_similarity = check_answer(user, correct, threshold=0.0, matcher="token_set")
+        expected = token_similarity >= 0.8
+    assert check_answer(user, correct, matcher=matcher)[0] == expected
+
+
+def test_early_exit_returns_a_value_below_the_threshold():
+    correct = "abcdefghij" * 8
+    user = "klmnopqrst" * 8
+    masks = _char_masks(correct)
+    similarity = _bounded_lcs_ratio(user, correct, masks, 0.8)
+    assert similarity < 0.8
+    # It is an upper bound of the exact ratio
+    assert similarity >= lcs_ratio(user, correct)
+
+
+def test_length_shortcut_returns_a_value_below_the_threshold():
+    similarity = _bounded_lcs_ratio("dna", "deoxyribonucleic acid", _char_masks("deoxyribonucleic acid"), 0.8)
+    assert similarity < 0.8
+
+
+def test_exact_match_after_normalization():
+    assert check_answer("  Adenine. ", "adenine") == (True, 1.0)
+
+
+@pytest.mark.parametrize("text", [
+    "Adenine",
+    "  Deoxyribonucleic acid.  ",
+    "Guanine, Cytosine, Thymine.",
+    "...,,,",
+    "",
+    "A.B,C d",
+    "\tTabs and\nnewlines.\n",
+])
+def test_normalize_answer_matches_the_replace_chain(text):
+    assert normalize_answer(text) == text.lower().strip().replace(".", "").replace(",", "")
+
+
+def test_batch_matches_single_checks():
+    pairs = TYPICAL_ANSWERS * 3
+    scores = check_answers_batch(pairs, workers=1)
+    assert list(scores) == [check_answer(user, correct)[1] for user, correct in pairs]
@@ -1,7 +1,6 @@
 # ui/add_card_tab.py (update the render_add_card_tab function)
 
 import streamlit as st
-import base64
 from data.deck_store import add_card_to_deck, get_deck_names
 
 def render_add_card_tab():
@@ -30,11 +29,8 @@ def render_add_card_tab():
         
         if submitted:
             if question.strip() and answer.strip():
-                # Convert image to base64 if uploaded
-                image_data = None
-                if uploaded_file:
-                    bytes_data = uploaded_file.read()
-                    image_data = base64.b64encode(bytes_data).decode()
+                # Raw bytes; the image store keeps one copy per distinct image
+                image_data = uploaded_file.read() if uploaded_file else None
                 
                 if add_card_to_deck(selected_deck, question, answer, image_data):
                     st.success("✅ Card added successfully!")
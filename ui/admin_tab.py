@@ -1,6 +1,9 @@
 # ui/admin_tab.py
 
 import streamlit as st
+from data.anticheat import rebuild_detector_state
+from data.db import get_index_report
+from data.rollups import rebuild_rollups
 from data.user_store import (
     get_suspicious_users,
     flag_user,
@@ -24,6 +27,7 @@ def render_admin_tab():
                     f"{severity_color} {item['username']} - {item['reason']}"):
                 user = get_user(item['username'])
                 
+                st.caption(f"Raised {item['since']:%Y-%m-%d %H:%M} UTC")
                 st.write(f"**Total Score:** {user.get('total_score', 0)}")
                 st.write(f"**Cards Studied:** {user.get('cards_studied', 0)}")
                 st.write(f"**Accuracy:** {(user.get('correct_answers', 0) / user.get('cards_studied', 1) * 100):.1f}%")
@@ -45,4 +49,35 @@ def render_admin_tab():
                         st.success("Score reset!")
                         st.rerun()
     else:
-        st.success("No suspicious activity detected!")
\ No newline at end of file
+        st.success("No suspicious activity detected!")
+    
+    with st.expander("Detector maintenance"):
+        st.caption("Alerts are updated as answers are logged. Rebuild to recompute every user's statistics from their history.")
+        if st.button("🔁 Rebuild detector state"):
+            with st.spinner("Replaying study history..."):
+                rebuild_detector_state()
+            st.success("Detector state rebuilt")
+            st.rerun()
+    
+    with st.expander("Score rollups"):
+        st.caption(
+            "Leaderboards by deck and period read daily and hourly rollups. "
+            "Rebuild to recompute the days still covered by raw study sessions."
+        )
+        if st.button("🔁 Rebuild rollups"):
+            with st.spinner("Recomputing rollups..."):
+                rebuild_rollups()
+            st.success("Rollups rebuilt")
+            st.rerun()
+    
+    with st.expander("Indexes"):
+        st.caption(
+            "Checked when this process connected. Undeclared indexes are not in "
+            "data/db.py INDEXES; unused ones had no operations since the server started."
+        )
+        report = get_index_report()
+        if report is None:
+            st.info("No index report (the database connection failed).")
+        else:
+            for key, label in [("created", "Created"), ("undeclared", "Undeclared"), ("unused", "Unused")]:
+                st.write(f"**{label}:** {', '.join(report[key]) or 'none'}")
@@ -5,7 +5,7 @@ import time
 
 
 def flashcard_box(text, image_data=None):
-    """Display flashcard with optional image"""
+    """Display flashcard with optional image (raw bytes or a static URL)"""
     st.markdown(
         f"""
         <div style="
@@ -25,8 +25,11 @@ def flashcard_box(text, image_data=None):
     )
     
     # Display image if present
+    # Images in static storage come as stable /app/static URLs that browsers
+    # can cache (see data.image_store); others are bytes from the process-wide
+    # image cache, sent through the media endpoint.
     if image_data:
-        st.image(f"data:image/png;base64,{image_data}", use_column_width=True)
+        st.image(image_data, use_column_width=True)
 
 
 def controls():
@@ -43,8 +46,8 @@ def controls():
     with col2:
         if st.button("➡️ Next", key="next_btn", width="stretch"):
             #st.write(f"DEBUG: Next clicked - index={st.session_state.index}")
-            st.session_state.index = (st.session_state.index + 1) % len(st.session_state.cards)
-            st.session_state.show_answer = False
+            from core.state import advance_card
+            advance_card()
             #st.write(f"DEBUG: After next - index={st.session_state.index}")
             st.rerun()
             
@@ -148,8 +151,55 @@ def user_stats(user_data):
         )
 
 
-def leaderboard(users_list):
-    """Display leaderboard with detailed stats in table format"""
+def study_heatmap(days, weeks=26):
+    """
+    Calendar heatmap of answers per day (one column per week, Monday on top)
+    Args:
+        days: dicts with "day" (datetime) and "answers"
+        weeks: Number of weeks shown, ending with the current one
+    """
+    from datetime import datetime, timedelta
+    
+    counts = {entry["day"].date(): entry["answers"] for entry in days}
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=today.weekday() + 7 * (weeks - 1))
+    busiest = max(counts.values(), default=0) or 1
+    
+    cells = []
+    for weekday in range(7):
+        for week in range(weeks):
+            day = start + timedelta(days=7 * week + weekday)
+            answers = counts.get(day, 0)
+            if day > today:
+                color = "transparent"
+            elif answers:
+                color = f"rgba(76, 175, 80, {0.25 + 0.75 * answers / busiest:.2f})"
+            else:
+                color = "#eee"
+            cells.append(
+                f'<div title="{day:%b %d}: {answers} cards" '
+                f'style="width:12px;height:12px;border-radius:2px;background:{color};"></div>'
+            )
+    
+    st.markdown(
+        f"""
+        <div style="display:grid;grid-template-columns:repeat({weeks}, 12px);gap:3px;">
+            {"".join(cells)}
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+
+def leaderboard(users_list, start_rank=1, total=None, page_size=None, key="leaderboard_page"):
+    """
+    Display leaderboard with detailed stats in table format
+    Args:
+        users_list: User documents (or rows shaped like them) for this page
+        start_rank: Rank of the first row
+        total: Number of ranked users; with page_size, shows a page picker
+            whose value is kept in st.session_state[key] (1-based)
+    """
     st.subheader("🏆 Leaderboard")
     if not users_list:
         st.info("No users yet. Be the first to study!")
@@ -157,28 +207,41 @@ def leaderboard(users_list):
     
     # Prepare data for table
     leaderboard_data = []
-    for idx, user in enumerate(users_list, 1):
+    for idx, user in enumerate(users_list, start_rank):
         medal = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else str(idx)
-        total = user.get("cards_studied", 0)
-        accuracy = (user.get("correct_answers", 0) / total * 100) if total > 0 else 0   
-        verif_total = user.get("verification_passed", 0) + user.get("verification_failed", 0)
-        verif_accuracy = (user.get("verification_passed", 0) / verif_total * 100) if verif_total > 0 else 0
+        total_cards = user.get("cards_studied", 0)
+        accuracy = (user.get("correct_answers", 0) / total_cards * 100) if total_cards > 0 else 0   
         
-        leaderboard_data.append({
+        row = {
             "Rank": medal,
             "Username": user['_id'],
             "Score": user.get("total_score", 0),
-            "Cards": total,
-            "Accuracy": f"{accuracy:.1f}%",
-            "Streak": user.get("current_streak", 0),
-            "Best Streak": user.get("best_streak", 0),
-            "Verified": f"{verif_accuracy:.0f}%" if verif_total > 0 else "N/A"
-        })
+            "Cards": total_cards,
+            "Accuracy": f"{accuracy:.1f}%"
+        }
+        # Streaks and verification only exist on full user documents
+        if "current_streak" in user:
+            verif_total = user.get("verification_passed", 0) + user.get("verification_failed", 0)
+            verif_accuracy = (user.get("verification_passed", 0) / verif_total * 100) if verif_total > 0 else 0
+            row.update({
+                "Streak": user.get("current_streak", 0),
+                "Best Streak": user.get("best_streak", 0),
+                "Verified": f"{verif_accuracy:.0f}%" if verif_total > 0 else "N/A"
+            })
+        leaderboard_data.append(row)
     
     # Display as dataframe
     import pandas as pd
     df = pd.DataFrame(leaderboard_data)
     st.dataframe(df, width="stretch", hide_index=True)
+    
+    if total and page_size and total > page_size:
+        pages = (total + page_size - 1) // page_size
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            st.number_input("Page", min_value=1, max_value=pages, key=key)
+        with col2:
+            st.caption(f"{total} ranked users · {pages} pages")
 
 
 def mode_selector():
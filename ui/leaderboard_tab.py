@@ -0,0 +1,57 @@
+# ui/leaderboard_tab.py
+
+import streamlit as st
+from ui.components import leaderboard
+from data.leaderboard import count_ranked_users, get_leaderboard_page, get_user_rank
+from data.rollups import get_rollup_leaderboard
+
+PAGE_SIZE = 10
+
+WINDOW_LABELS = {
+    "all": "All time",
+    "week": "This week",
+    "today": "Today",
+}
+
+
+def _load_page(deck, window, page):
+    """Rows and total for a leaderboard page"""
+    skip = (page - 1) * PAGE_SIZE
+    if deck is None and window == "all":
+        # All-time totals come from the shared cached board (and MongoDB past it)
+        return get_leaderboard_page(skip, PAGE_SIZE), count_ranked_users()
+    return get_rollup_leaderboard(deck, window, skip, PAGE_SIZE)
+
+
+def render_leaderboard_tab(user_data, deck_names):
+    """Render the leaderboard tab with deck and period filters"""
+    col1, col2 = st.columns(2)
+    with col1:
+        window = st.radio(
+            "Period",
+            options=list(WINDOW_LABELS),
+            format_func=WINDOW_LABELS.get,
+            horizontal=True,
+            key="leaderboard_window"
+        )
+    with col2:
+        deck = st.selectbox(
+            "Deck",
+            options=[None] + list(deck_names),
+            format_func=lambda name: "All decks" if name is None else name,
+            key="leaderboard_deck"
+        )
+
+    page = st.session_state.get("leaderboard_page", 1)
+    rows, total = _load_page(deck, window, page)
+    if page > 1 and not rows:
+        # The filters changed and this page no longer exists
+        page = st.session_state.leaderboard_page = 1
+        rows, total = _load_page(deck, window, page)
+
+    leaderboard(rows, start_rank=(page - 1) * PAGE_SIZE + 1, total=total, page_size=PAGE_SIZE)
+
+    if deck is None and window == "all":
+        rank = get_user_rank(user_data)
+        if rank:
+            st.caption(f"You are #{rank}")
@@ -9,8 +9,13 @@ from data.deck_store import (
     find_duplicate_cards,
     delete_deck,
     rename_deck,
-    create_deck
+    create_deck,
+    get_image_savings
 )
+from data.image_store import get_image
+from data.card_source import memory_report
+from core.scheduler import live_queues
+from data.user_store import regrade_deck_answers
 
 def render_manage_tab():
     st.header("🗂️ Manage Decks")
@@ -66,6 +71,13 @@ def render_manage_tab():
                 else:
                     st.warning("Please enter a different name")
         
+        # Regrade logged typed answers after the answer key changed
+        with st.expander("🔁 Regrade Typed Answers"):
+            st.caption("Re-check logged quiz answers for this deck against the current answers and adjust scores.")
+            if st.button("Regrade Answers", key="regrade_deck_btn"):
+                changed = regrade_deck_answers(selected_deck)
+                st.success(f"✅ Regraded deck: {changed} answer(s) changed")
+        
         # Delete deck
         with st.expander("🗑️ Delete Deck", expanded=False):
             st.warning(f"⚠️ This will permanently delete '{selected_deck}' and all its cards!")
@@ -82,6 +94,22 @@ def render_manage_tab():
                         st.error("❌ Deletion failed")
                 else:
                     st.error("❌ Confirmation text doesn't match")
+        
+        # Shared deck memory (this server process)
+        with st.expander("🧠 Deck Memory"):
+            report = memory_report(live_queues())
+            if not report:
+                st.caption("No deck has been studied in this process yet.")
+            for row in report:
+                st.write(
+                    f"**{row['deck']}**: {row['loaded']}/{row['cards']} cards loaded, "
+                    f"{row['shared_bytes'] / 1024:.0f} KB shared by {row['sessions']} session(s)"
+                )
+                st.caption(
+                    f"Per session: {row['per_session_bytes'] / 1024:.1f} KB of queue state "
+                    f"instead of a {row['per_session_copy_bytes'] / 1024:.0f} KB card list; "
+                    f"{row['saved_bytes'] / 1024:.0f} KB saved in total"
+                )
     
     with card_col:
         st.subheader(f"Card Management: {selected_deck}")
@@ -95,6 +123,14 @@ def render_manage_tab():
         
         st.write(f"**Total cards:** {len(cards)}")
         
+        savings = get_image_savings(selected_deck)
+        if savings["images"]:
+            saved = savings["original_bytes"] - savings["stored_bytes"]
+            st.caption(
+                f"🖼️ {savings['images']} image(s): {savings['stored_bytes'] / 1024:.0f} KB stored, "
+                f"{saved / 1024:.0f} KB saved vs. uploads"
+            )
+        
         # Find duplicates
         duplicates = find_duplicate_cards(selected_deck)
         if duplicates:
@@ -105,7 +141,7 @@ def render_manage_tab():
                     st.write(f"Q: {dup['question']}")
                     st.write(f"A: {dup['answer']}")
                     if st.button(f"Delete duplicate #{dup['index']}", key=f"del_dup_{dup['index']}"):
-                        if delete_card(selected_deck, dup['index']):
+                        if delete_card(selected_deck, dup['card_id']):
                             st.success(f"Deleted card #{dup['index']}")
                             st.rerun()
                     st.divider()
@@ -135,6 +171,9 @@ def render_manage_tab():
                 
                 if card:
                     st.write(f"**Editing card #{card_index}**")
+                    thumbnail = get_image(card["thumbnail_id"]) if card.get("thumbnail_id") else None
+                    if thumbnail:
+                        st.image(thumbnail)
                     
                     # Edit form
                     with st.form(key=f"edit_form_{card_index}"):
@@ -155,7 +194,7 @@ def render_manage_tab():
                         
                         if submitted:
                             if new_question.strip() and new_answer.strip():
-                                if edit_card(selected_deck, card_index, new_question, new_answer):
+                                if edit_card(selected_deck, card['card_id'], new_question, new_answer):
                                     st.success(f"✅ Updated card #{card_index}")
                                     st.rerun()
                                 else:
@@ -188,7 +227,7 @@ def render_manage_tab():
                     type="primary",
                     key=f"confirm_delete_{delete_index}"
                 ):
-                    if delete_card(selected_deck, delete_index):
+                    if delete_card(selected_deck, delete_card_data['card_id']):
                         st.success(f"✅ Deleted card #{delete_index}")
                         st.rerun()
                     else:
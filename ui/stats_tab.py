@@ -1,7 +1,8 @@
 # ui/stats_tab.py
 
 import streamlit as st
-from ui.components import user_stats
+from data.analytics import get_user_analytics
+from ui.components import user_stats, study_heatmap
 
 
 def render_stats_tab(user_data):
@@ -31,5 +32,56 @@ def render_stats_tab(user_data):
                 f"**Verification Accuracy:** {verif_accuracy:.1f}% "
                 f"({verif_passed}/{verif_total})"
             )
+        
+        _render_analytics(user_data["_id"])
     else:
-        st.info("Start studying to see your stats!")
\ No newline at end of file
+        st.info("Start studying to see your stats!")
+
+
+def _render_analytics(username):
+    """Per-deck accuracy, hardest cards, response-time trend and heatmap"""
+    # One read of the user's precomputed analytics (shared for a few seconds)
+    analytics = get_user_analytics(username)
+    
+    st.divider()
+    st.write("### 📅 Study Activity")
+    study_heatmap(analytics["days"])
+    if analytics["updated_at"]:
+        st.caption(f"Updated {analytics['updated_at']:%Y-%m-%d %H:%M} UTC")
+    
+    if analytics["decks"]:
+        st.write("### 📚 Accuracy by Deck")
+        st.dataframe([
+            {
+                "Deck": deck["deck"],
+                "Answers": deck["answers"],
+                "Accuracy": f"{deck['accuracy']:.1f}%",
+                "Avg Time": f"{deck['avg_time']:.1f}s"
+            }
+            for deck in analytics["decks"]
+        ], width="stretch", hide_index=True)
+    
+    if analytics["hardest"]:
+        st.write("### 🧩 Hardest Cards")
+        st.dataframe([
+            {
+                "Question": card["question"],
+                "Deck": card["deck"],
+                "Answers": card["answers"],
+                "Missed": f"{card['miss_rate']:.0f}%",
+                "Avg Time": f"{card['avg_time']:.1f}s"
+            }
+            for card in analytics["hardest"]
+        ], width="stretch", hide_index=True)
+    
+    recent = analytics["days"][-30:]
+    if len(recent) > 1:
+        st.write("### ⏱️ Response Time")
+        st.line_chart(
+            {
+                "Avg seconds": [day["avg_time"] for day in recent],
+                "Day": [day["day"] for day in recent]
+            },
+            x="Day",
+            y="Avg seconds"
+        )
@@ -4,19 +4,21 @@ import streamlit as st
 import time
 import random
 from core.study_modes import get_mode_config
-from core.scoring import calculate_points
+from core.scoring import calculate_points, project_score
 from core.answer_checking import check_answer
+from core.state import advance_card, current_card, record_review, study_queue_counts
 from ui.components import (
     flashcard_box, controls, answer_buttons, commit_buttons,
     quiz_input, timer_display
 )
-from data.user_store import update_user_score, log_study_session
+from data.user_store import get_user, log_study_session, submit_score_update
+from data.image_store import card_image
 
 
-def render_study_tab(cards, deck_name, username, study_mode, init_state_func):
+def render_study_tab(deck, deck_name, username, study_mode, init_state_func):
     """Render the study flashcards tab"""
     
-    if not cards:
+    if not len(deck):
         st.warning(f"The deck '{deck_name}' is empty!")
         
         col1, col2 = st.columns([3, 1])
@@ -26,10 +28,9 @@ def render_study_tab(cards, deck_name, username, study_mode, init_state_func):
         # Get admin email
         from streamlit_auth.core import get_auth_db
         db = get_auth_db()
-        admin_users = [u for u in db.get_all_users() if u.get("is_admin")]
+        admin_email = next((u["email"] for u in db.find_admins() if u.get("email")), None)
         
-        if admin_users and admin_users[0].get("email"):
-            admin_email = admin_users[0]["email"]
+        if admin_email:
             subject = f"Request: Add cards to '{deck_name}' deck"
             body = f"Hi,\n\nCould you please add flashcards to '{deck_name}'?\n\nThanks,\n{username}"
             
@@ -46,7 +47,7 @@ def render_study_tab(cards, deck_name, username, study_mode, init_state_func):
         return  # STOP HERE if no cards
     
     # Only runs if we have cards
-    init_state_func(cards, deck_name)
+    init_state_func(deck, deck_name)
     mode_config = get_mode_config(study_mode)
     
     # Initialize session variables
@@ -64,7 +65,10 @@ def render_study_tab(cards, deck_name, username, study_mode, init_state_func):
     # Add deck title at the top
     st.subheader(f"📚 Studying: {deck_name}")
 
-    card = st.session_state.cards[st.session_state.index]
+    card = current_card()
+    if card is None:
+        st.info("No card to show right now - it may have just been removed from the deck.")
+        return
     
     # Show verification badge
     if st.session_state.is_verification:
@@ -76,7 +80,7 @@ def render_study_tab(cards, deck_name, username, study_mode, init_state_func):
     # SIMPLE FLASHCARD MODE
     if not mode_config["requires_commit"] and not mode_config["requires_typing"] and not st.session_state.is_verification:
         if st.session_state.show_answer:
-            flashcard_box(card["answer"], card.get("image"))  # Pass image
+            flashcard_box(card["answer"], card_image(card))  # Pass image
         else:
             flashcard_box(card["question"])
         
@@ -100,7 +104,8 @@ def render_study_tab(cards, deck_name, username, study_mode, init_state_func):
             flashcard_box(card["answer"])
             _show_quiz_result()
 
-    st.write(f"Card {st.session_state.index + 1} of {len(st.session_state.cards)}")
+    due, new = study_queue_counts()
+    st.write(f"Due: {due} · New: {new} · {len(deck)} cards in deck")
     st.write(f"Session Streak: {st.session_state.session_streak} 🔥")
     
 
@@ -129,8 +134,10 @@ def _handle_quiz_mode(card, deck_name, username, study_mode):
         is_correct, similarity = check_answer(user_answer, card["answer"])
         
         points = calculate_points(is_correct)
-        update_user_score(username, points, correct=is_correct, verified=st.session_state.is_verification)
-        log_study_session(username, deck_name, card["question"], response_time, is_correct, study_mode)
+        _submit_score_update(username, points, is_correct)
+        log_study_session(username, deck_name, card["_id"], response_time, is_correct, study_mode, user_answer, points,
+                          verified=st.session_state.is_verification)
+        record_review(card, is_correct, response_time)
         
         st.session_state.session_streak = st.session_state.session_streak + 1 if is_correct else 0
         st.session_state.quiz_result = {"correct": is_correct, "similarity": similarity, "user_answer": user_answer}
@@ -197,8 +204,10 @@ def _record_answer(card, deck_name, username, study_mode, correct):
     """Record answer and update score"""
     response_time = time.time() - st.session_state.card_start_time
     points = calculate_points(correct)
-    update_user_score(username, points, correct=correct, verified=st.session_state.is_verification)
-    log_study_session(username, deck_name, card["question"], response_time, correct, study_mode)
+    _submit_score_update(username, points, correct)
+    log_study_session(username, deck_name, card["_id"], response_time, correct, study_mode, points=points,
+                      verified=st.session_state.is_verification)
+    record_review(card, correct, response_time)
     
     if correct:
         st.session_state.session_streak += 1
@@ -206,10 +215,47 @@ def _record_answer(card, deck_name, username, study_mode, correct):
         st.session_state.session_streak = 0
 
 
+def _submit_score_update(username, points, correct):
+    """
+    Show the new score right away and write it in the background.
+    The optimistic user document is replaced by the server's in reconcile_score_updates.
+    """
+    verified = st.session_state.is_verification
+    _apply_score_update(project_score(st.session_state.get("user_data"), points, correct, verified))
+    future = submit_score_update(username, points, correct=correct, verified=verified)
+    st.session_state.setdefault("pending_score_updates", []).append(future)
+
+
+def reconcile_score_updates(username):
+    """
+    Once every background score update for this session has finished, take the
+    user document from the server: the last update's result, or a fresh read
+    if any update failed.
+    """
+    pending = st.session_state.get("pending_score_updates")
+    if not pending or not all(future.done() for future in pending):
+        return
+    st.session_state.pending_score_updates = []
+    
+    if any(future.exception() is not None for future in pending):
+        st.toast("⚠️ Some answers could not be saved; your score was reloaded.")
+        _apply_score_update(get_user(username))
+    else:
+        _apply_score_update(pending[-1].result())
+
+
+def _apply_score_update(user):
+    """Keep session state in sync with the user document returned by the score update"""
+    if not user:
+        return
+    # calculate_points reads the authoritative streak from here
+    st.session_state.current_streak = user.get("current_streak", 0)
+    st.session_state.user_data = user
+
+
 def _next_card():
-    """Move to next card and reset state"""
-    st.session_state.index = (st.session_state.index + 1) % len(st.session_state.cards)
-    st.session_state.show_answer = False
+    """Move to next card (by the spaced repetition queue) and reset state"""
+    advance_card()
     st.session_state.card_start_time = time.time()
     st.session_state.committed_answer = None
     from core.study_modes import get_mode_config, STUDY_MODES